@@ -4,6 +4,8 @@ import numpy as np
 from scipy.optimize import minimize
 import scipy.stats as stats
 
+from ww_utils import conversion_factor_schedule
+
 # Read wastewater data from RKI, use aggregated curve for nationwide data
 df = pd.read_csv('https://raw.githubusercontent.com/robert-koch-institut/Abwassersurveillance_AMELAG/main/amelag_aggregierte_kurve.tsv', sep='\t')
 
@@ -12,31 +14,11 @@ df_inter = df.interpolate(method='linear')
 df_wastewater = df_inter[['datum', 'loess_vorhersage']]
 df_wastewater['datum'] = pd.to_datetime(df_wastewater['datum'])
 
-# Define conversion factor function with adjustable parameters
-def conversion_factor(date, cf, factor1, factor2):
-    start_date_omicron = pd.Timestamp('2021-12-17')
-    end_date_omicron = start_date_omicron + pd.Timedelta(days=30)
-    start_date_post_omicron = pd.Timestamp('2022-08-01')
-    end_date_post_omicron = start_date_post_omicron + pd.Timedelta(days=30)
-    
-    if date < start_date_omicron:
-        return cf
-    elif start_date_omicron <= date <= end_date_omicron:
-        proportion = (date - start_date_omicron) / pd.Timedelta(days=30)
-        return cf + proportion * ((cf * factor1) - cf)
-    elif end_date_omicron < date < start_date_post_omicron:
-        return cf * factor1
-    elif start_date_post_omicron <= date <= end_date_post_omicron:
-        proportion = (date - start_date_post_omicron) / pd.Timedelta(days=30)
-        return (cf * factor1) + proportion * ((cf * factor2) - (cf * factor1))
-    else:
-        return cf * factor2
-
 # Objective function to minimize (negative correlation)
 def objective(factors):
     factor1, factor2 = factors
-    df_wastewater['adjusted_loess_vorhersage'] = df_wastewater.apply(
-        lambda row: row['loess_vorhersage'] * conversion_factor(row['datum'], 1, factor1, factor2), axis=1
+    df_wastewater['adjusted_loess_vorhersage'] = (
+        df_wastewater['loess_vorhersage'] * conversion_factor_schedule(df_wastewater['datum'], 1, [factor1, factor2])
     )
     
     merged = pd.merge(df_wastewater, ih_2022, left_on='datum', right_on='date', how='inner')
@@ -63,8 +45,8 @@ optimal_factors = result.x
 print(f"Optimal factors: {optimal_factors}")
 
 # Apply the optimal factors to the wastewater data
-df_wastewater['adjusted_loess_vorhersage'] = df_wastewater.apply(
-    lambda row: row['loess_vorhersage'] * conversion_factor(row['datum'], 1, optimal_factors[0], optimal_factors[1]), axis=1
+df_wastewater['adjusted_loess_vorhersage'] = (
+    df_wastewater['loess_vorhersage'] * conversion_factor_schedule(df_wastewater['datum'], 1, optimal_factors)
 )
 
 # Calculate the final correlation
@@ -0,0 +1,127 @@
+# Purpose: Find and download the newest dated Biobot CSV export (CloudFront)
+#
+# The export of a day lives at <base_url><YYYY-MM-DD><suffix>. Every candidate date
+# of the look-back is probed at once with HEAD requests over one pooled session,
+# and only the newest existing file is fetched: streamed to disk with a conditional
+# GET (If-None-Match / If-Modified-Since from the previous download), so a file
+# that has not changed is never downloaded again.
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BIOBOT_BASE_URL = "https://d1t7q96h7r5kqm.cloudfront.net/"
+DAYS_BACK = 14
+TIMEOUT = 30
+CHUNK_BYTES = 1 << 16
+
+# Download bookkeeping (git-ignored): the ETag / Last-Modified of every downloaded file,
+# keyed by local path, and the partial downloads (overridable from the environment)
+CACHE_DIR = os.environ.get("BIOBOT_CACHE_DIR", ".biobot_cache")
+VALIDATORS_FILE = os.environ.get("BIOBOT_VALIDATORS_FILE", os.path.join(CACHE_DIR, "validators.json"))
+
+
+def make_session(pool_size=DAYS_BACK):
+    """A requests session whose connection pool serves pool_size concurrent requests."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def candidate_dates(start_date, days_back):
+    """YYYY-MM-DD strings from start_date back over days_back days, newest first."""
+    return [(start_date - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days_back)]
+
+
+def find_latest(session, base_url, dates, suffix, timeout=TIMEOUT):
+    """Newest of `dates` whose file answers a HEAD request with 200, or None.
+
+    All dates are probed concurrently; missing files (CloudFront answers 403/404) and
+    failed requests count as absent.
+    """
+    def exists(date_str):
+        try:
+            response = session.head(f"{base_url}{date_str}{suffix}", timeout=timeout, allow_redirects=True)
+        except requests.RequestException:
+            return False
+        return response.status_code == 200
+
+    with ThreadPoolExecutor(max_workers=max(len(dates), 1)) as pool:
+        found = list(pool.map(exists, dates))
+    return next((date_str for date_str, ok in zip(dates, found) if ok), None)
+
+
+def _load_validators(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_validators(path, validators):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(validators, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def conditional_download(session, url, file_path, validators_file=VALIDATORS_FILE, timeout=TIMEOUT,
+                         cache_dir=CACHE_DIR):
+    """Stream url to file_path unless the copy on disk is still current.
+
+    The body is streamed to a .part file in cache_dir and moved into place once complete.
+    Returns True when a new body was written, False when the server answered 304.
+    """
+    validators = _load_validators(validators_file)
+    headers = {}
+    known = validators.get(file_path, {})
+    if os.path.exists(file_path) and known.get("url") == url:
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+        os.makedirs(cache_dir, exist_ok=True)
+        part_path = os.path.join(cache_dir, os.path.basename(file_path) + ".part")
+        with open(part_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+                f.write(chunk)
+        os.replace(part_path, file_path)
+        validators[file_path] = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+    _save_validators(validators_file, validators)
+    return True
+
+
+def download_latest_csv(file_prefix, suffix, base_url=BIOBOT_BASE_URL, start_date=None, days_back=DAYS_BACK,
+                        session=None):
+    """Download the newest <base_url><date><suffix> of the look-back to <file_prefix><date>.csv.
+
+    Returns (message, file_path); file_path is None when no file exists in the range.
+    """
+    dates = candidate_dates(start_date or datetime.now(), days_back)
+    own_session = session is None
+    session = make_session(days_back) if own_session else session
+    try:
+        date_str = find_latest(session, base_url, dates, suffix)
+        if date_str is None:
+            return "No CSV file found in the specified date range.", None
+        file_path = f"{file_prefix}{date_str}.csv"
+        if conditional_download(session, f"{base_url}{date_str}{suffix}", file_path):
+            return f"CSV file for {date_str} downloaded successfully at {file_path}.", file_path
+        return f"CSV file for {date_str} unchanged at {file_path}.", file_path
+    finally:
+        if own_session:
+            session.close()
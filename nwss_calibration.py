@@ -0,0 +1,134 @@
+# Purpose: Biobot-to-NWSS calibration for the NWSS conversion-factor engine (nwss_pipeline.py)
+#
+# The Biobot history and the NWSS state/national aggregate are joined once on
+# (State, Date). Look-back windows are a vectorised mask, and every conversion
+# factor family (inf, wastewater; states and Nationwide) comes out of a single
+# grouped mean over that join.
+import numpy as np
+import pandas as pd
+
+# Biobot look-back window before each region's latest date (Colorado = 109 days as exception)
+LOOKBACK = pd.DateOffset(months=4)
+LOOKBACK_EXCEPTIONS = {
+    "Colorado": pd.DateOffset(days=109),
+}
+
+# Data-quality gates a state must pass over its look-back window to be published
+QC_MIN_CONTRIBUTING_PLANTS = 3
+QC_MIN_PERCENTAGE_COVERED = 25
+QC_MIN_CORRELATION = 0.5
+
+
+def lookback_mask(biobot_data):
+    """True for Biobot rows inside their region's look-back window.
+
+    Expects Measure, State and Date columns. Each (Measure, State) is windowed back from
+    its own latest date, except Nationwide, which is windowed from the latest date of the
+    whole measure (legacy behaviour).
+    """
+    latest = biobot_data.groupby(["Measure", "State"])["Date"].transform("max")
+    nationwide = biobot_data["State"] == "Nationwide"
+    latest[nationwide] = biobot_data.groupby("Measure")["Date"].transform("max")[nationwide]
+
+    start = latest - LOOKBACK
+    for state, lookback in LOOKBACK_EXCEPTIONS.items():
+        is_state = biobot_data["State"] == state
+        start[is_state] = latest[is_state] - lookback
+    return biobot_data["Date"] > start
+
+
+def conversion_factors(merged_data, biobot_window):
+    """Mean NWSS smoothed gc/capita/day ÷ Biobot Value per (Measure, State).
+
+    merged_data is the state + Nationwide NWSS aggregate; biobot_window the Biobot rows
+    inside the look-back window. Returns {measure: {state: factor}}; regions without NWSS
+    data on any window date get no factor.
+    """
+    joined = pd.merge(
+        biobot_window[["Measure", "State", "Date", "Value"]],
+        merged_data[["State", "Date", "Smoothed_gc/capita/day"]],
+        on=["State", "Date"], how="inner"
+    )
+    joined["NWSS/Biobot"] = joined["Smoothed_gc/capita/day"] / joined["Value"]
+    factors = joined.groupby(["Measure", "State"])["NWSS/Biobot"].mean()
+    return {
+        measure: factors.xs(measure).to_dict()
+        for measure in factors.index.get_level_values("Measure").unique()
+    }
+
+
+def print_factors(factors, label="Conversion Factor"):
+    for state, factor in factors.items():
+        if state == "Nationwide":
+            print(f"Nationwide {label}: {factor}")
+        else:
+            print(f"State: {state}, {label}: {factor}")
+
+
+def rescale_wastewater(biobot_data, wastewater_factors):
+    """Scale the Biobot wastewater history onto the NWSS scale.
+
+    Every `wastewater` row's Value is multiplied by its Region's factor; regions without a
+    factor keep factor 1. Returns (rescaled frame, sorted regions that fell back to 1).
+    """
+    is_wastewater = biobot_data["Measure"] == "wastewater"
+    regions = biobot_data["Region"]
+    has_factor = regions.isin(list(wastewater_factors))
+    factor = regions.map(wastewater_factors).where(has_factor, 1)
+
+    rescaled = biobot_data.copy()
+    rescaled["Value"] = biobot_data["Value"].where(~is_wastewater, biobot_data["Value"] * factor)
+    fallback_regions = sorted(regions[is_wastewater & ~has_factor].dropna().unique())
+    return rescaled, fallback_regions
+
+
+def grouped_correlation(frame, by, x, y):
+    """Pearson correlation of columns x and y within each group, skipping rows where either is NaN."""
+    frame = frame.dropna(subset=[x, y])
+    groups = frame.groupby(by)
+    dx = frame[x] - groups[x].transform("mean")
+    dy = frame[y] - groups[y].transform("mean")
+    sums = pd.DataFrame({"xy": dx * dy, "xx": dx * dx, "yy": dy * dy}).groupby(frame[by]).sum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums["xy"] / np.sqrt(sums["xx"] * sums["yy"])).clip(-1, 1)
+
+
+def qc_table(state_aggregated, merged_data, biobot_window, conversion_factors):
+    """Data-quality gating metrics of every NWSS state over its Biobot INF look-back window.
+
+    Returns one row per state with the window bounds, min/max contributing plants and % of
+    the state population covered on the window dates, the Pearson correlation of the
+    smoothed NWSS signal with Biobot, the conversion factor, and whether the state passes
+    the QC_* gates.
+    """
+    window = biobot_window[["State", "Date", "Value"]]
+    window_dates = window[["State", "Date"]].drop_duplicates()
+
+    bounds = window_dates.groupby("State")["Date"].agg(Window_Start="min", Window_End="max")
+    coverage = pd.merge(
+        state_aggregated[["State", "Date", "Contributing_Plants", "Percentage_Covered"]],
+        window_dates, on=["State", "Date"], how="inner"
+    ).groupby("State").agg(
+        Min_Contributing_Plants=("Contributing_Plants", "min"),
+        Max_Contributing_Plants=("Contributing_Plants", "max"),
+        Min_Percentage_Covered=("Percentage_Covered", "min"),
+        Max_Percentage_Covered=("Percentage_Covered", "max"),
+    )
+    pairs = pd.merge(
+        merged_data[["State", "Date", "Smoothed_gc/capita/day"]], window, on=["State", "Date"], how="inner"
+    )
+    correlation = grouped_correlation(pairs, "State", "Smoothed_gc/capita/day", "Value").rename("Correlation")
+
+    states = pd.Index(sorted(state_aggregated["State"].unique()), name="State")
+    qc = pd.DataFrame(index=states).join(bounds).join(coverage).join(correlation)
+    # Plant counts stay integers for states without window data
+    plant_cols = ["Min_Contributing_Plants", "Max_Contributing_Plants"]
+    qc[plant_cols] = qc[plant_cols].astype("Int64")
+    qc["Conversion_Factor"] = states.map(conversion_factors)
+    qc["Passed"] = (
+        states.isin(list(conversion_factors))
+        & (qc["Min_Contributing_Plants"] >= QC_MIN_CONTRIBUTING_PLANTS)
+        & (qc["Min_Percentage_Covered"] >= QC_MIN_PERCENTAGE_COVERED)
+        & (qc["Correlation"] >= QC_MIN_CORRELATION)
+    )
+    return qc.reset_index()
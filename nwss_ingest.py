@@ -0,0 +1,173 @@
+# Purpose: Incremental ingest of the CDC NWSS consolidated dataset (j9g8-acpt)
+#
+# The full dataset is pulled once and kept in a local store. Later runs only ask
+# Socrata for rows collected or modified after the stored watermark, minus a
+# look-back window so that revised samples are picked up again.
+import json
+import os
+
+import pandas as pd
+
+from socrata_fetch import fetch_paged
+
+NWSS_DOMAIN = "data.cdc.gov"
+NWSS_DATASET = "j9g8-acpt"
+
+# Local store location and incremental settings (overridable from the environment)
+STORE_DIR = os.environ.get("NWSS_STORE_DIR", ".nwss_cache")
+LOOKBACK_DAYS = int(os.environ.get("NWSS_LOOKBACK_DAYS", "60"))
+FULL_REFRESH_DAYS = int(os.environ.get("NWSS_FULL_REFRESH_DAYS", "7"))
+
+# Socrata system fields used as row identity and last-modified marker
+ROW_ID = ":id"
+UPDATED_AT = ":updated_at"
+DATE_COL = "sample_collect_date"
+
+# Only the columns the conversion-factor pipeline uses are requested ($select)
+NWSS_COLUMNS = [
+    "sample_collect_date",
+    "sewershed_id",
+    "wwtp_jurisdiction",
+    "population_served",
+    "sample_matrix",
+    "major_lab_method",
+    "pcr_target_flowpop_lin"
+]
+NWSS_DTYPES = {
+    "sample_collect_date": "datetime",
+    "population_served": "float",
+    "pcr_target_flowpop_lin": "float",
+}
+
+# Bump when the stored frame layout changes; an old store then triggers a full pull
+STORE_VERSION = 2
+
+
+def _store_paths(store_dir, dataset):
+    return (
+        os.path.join(store_dir, f"{dataset}.pkl"),
+        os.path.join(store_dir, f"{dataset}_watermark.json"),
+    )
+
+
+def read_watermark(store_dir=STORE_DIR, dataset=NWSS_DATASET):
+    """Return the watermark dict of the store, or None if there is none."""
+    watermark_path = _store_paths(store_dir, dataset)[1]
+    if not os.path.exists(watermark_path):
+        return None
+    with open(watermark_path) as f:
+        return json.load(f)
+
+
+def load_store(store_dir=STORE_DIR, dataset=NWSS_DATASET):
+    """Return (stored rows, watermark dict); (None, None) if there is no usable store."""
+    store_path = _store_paths(store_dir, dataset)[0]
+    watermark = read_watermark(store_dir, dataset)
+    if not os.path.exists(store_path) or watermark is None or watermark.get("version") != STORE_VERSION:
+        return None, None
+    return pd.read_pickle(store_path), watermark
+
+
+def save_store(rows, store_dir=STORE_DIR, dataset=NWSS_DATASET, full_refresh_at=None):
+    """Persist the raw rows and their watermark (max collect date and max :updated_at).
+
+    Rows without any collect date (e.g. an empty pull) have no watermark; the store and
+    its watermark are then left as they are and the stored watermark (or None) is returned.
+    """
+    collect_dates = pd.to_datetime(rows[DATE_COL], errors="coerce")
+    if collect_dates.isna().all():
+        print("NWSS ingest: no dated rows; store and watermark left unchanged")
+        return read_watermark(store_dir, dataset)
+    os.makedirs(store_dir, exist_ok=True)
+    store_path, watermark_path = _store_paths(store_dir, dataset)
+    watermark = {
+        "version": STORE_VERSION,
+        "sample_collect_date": collect_dates.max().strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "updated_at": rows[UPDATED_AT].dropna().max(),
+        "full_refresh_at": full_refresh_at,
+        "rows": int(len(rows)),
+    }
+    # Write to temporary files first so an interrupted run never leaves a half store
+    rows.to_pickle(store_path + ".tmp")
+    with open(watermark_path + ".tmp", "w") as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(store_path + ".tmp", store_path)
+    os.replace(watermark_path + ".tmp", watermark_path)
+    return watermark
+
+
+def _get(dataset, timeout, where=None):
+    return fetch_paged(
+        NWSS_DOMAIN, dataset, [ROW_ID, UPDATED_AT] + NWSS_COLUMNS,
+        where=where, dtypes=NWSS_DTYPES, timeout=timeout
+    )
+
+
+def merge_increment(stored, increment, since):
+    """Replace the look-back window and any re-published rows of the store with the increment.
+
+    Every stored row collected on or after `since` was requested again, so it is dropped
+    (this also removes samples CDC deleted inside the window). Rows outside the window that
+    came back because their :updated_at moved are replaced by their new version via :id.
+    An empty increment still drops the window.
+    """
+    stored_dates = pd.to_datetime(stored[DATE_COL], errors="coerce")
+    keep = (stored_dates < since) & ~stored[ROW_ID].isin(increment[ROW_ID])
+    if increment.empty:
+        # Concatenating the empty frame would turn the typed columns into object
+        return stored[keep].reset_index(drop=True)
+    return pd.concat([stored[keep], increment], ignore_index=True, sort=False)
+
+
+def _full_pull(dataset, store_dir, timeout, now):
+    print(f"NWSS ingest: full pull of {dataset}")
+    rows = _get(dataset, timeout)
+    save_store(rows, store_dir, dataset, full_refresh_at=now.isoformat())
+    return rows
+
+
+def is_republished(stored, increment, since):
+    """True when the increment holds rows dated before `since` under :ids the store never had.
+
+    Outside the look-back window only re-published versions of stored rows come back, with
+    their :id kept. Unknown :ids there mean CDC replaced the dataset with fresh row ids, so
+    the store can no longer be matched to it row by row. (A late sample collected before
+    the window also looks like this; it only costs one full pull.)
+    """
+    increment_dates = pd.to_datetime(increment[DATE_COL], errors="coerce")
+    old_rows = increment[increment_dates < since]
+    return bool((~old_rows[ROW_ID].isin(stored[ROW_ID])).any())
+
+
+def fetch_nwss_raw(dataset=NWSS_DATASET, store_dir=STORE_DIR, lookback_days=LOOKBACK_DAYS,
+                   full_refresh_days=FULL_REFRESH_DAYS, full_refresh=False, timeout=180):
+    """Return the raw NWSS rows (typed NWSS_COLUMNS), fetching only what changed since the last run."""
+    now = pd.Timestamp.now()
+
+    stored, watermark = (None, None) if full_refresh else load_store(store_dir, dataset)
+    if stored is not None and watermark.get("full_refresh_at"):
+        # Periodic full pull catches deletions older than the look-back window
+        if now - pd.Timestamp(watermark["full_refresh_at"]) > pd.Timedelta(days=full_refresh_days):
+            stored = None
+
+    if stored is None:
+        return _full_pull(dataset, store_dir, timeout, now)
+
+    since = pd.Timestamp(watermark["sample_collect_date"]) - pd.Timedelta(days=lookback_days)
+    where = f"{DATE_COL} >= '{since.strftime('%Y-%m-%dT%H:%M:%S.000')}'"
+    if watermark.get("updated_at"):
+        where += f" OR {UPDATED_AT} > '{watermark['updated_at']}'"
+    increment = _get(dataset, timeout, where=where)
+    print(
+        f"NWSS ingest: {len(increment)} rows since {since.date()} "
+        f"(stored {len(stored)}, watermark {watermark['sample_collect_date']})"
+    )
+
+    if is_republished(stored, increment, since):
+        # Merging by :id would keep every old row next to its re-id'd version
+        print(f"NWSS ingest: {dataset} was republished with new row ids")
+        return _full_pull(dataset, store_dir, timeout, now)
+
+    rows = merge_increment(stored, increment, since)
+    save_store(rows, store_dir, dataset, full_refresh_at=watermark.get("full_refresh_at"))
+    return rows
@@ -0,0 +1,792 @@
+# Purpose: NWSS conversion-factor engine (run by ww_factor_NWSS_Sep_25.py)
+#
+# The NWSS chain (fetch, clean, outliers, interpolation, state and national
+# aggregation) runs once; every Biobot calibration scenario in SCENARIOS is then
+# applied to that shared aggregate and writes its own output files.
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from nwss_calibration import conversion_factors, lookback_mask, print_factors, qc_table, rescale_wastewater
+from nwss_ingest import STORE_DIR, fetch_nwss_raw, read_watermark
+from ww_writers import write_columnar_json, write_partitioned_json, write_records_json
+
+# Provisional Arizona method-6 divisors (central scenario, see clean_nwss_raw)
+ARIZONA_METHOD6_DIVISORS = {
+    "17":   12.262381,
+    "18":   12.852028,
+    "19":   15.751837,
+    "20":   17.017968,
+    "21":    5.655802,
+    "22":   11.773881,
+    "23":    4.799532,
+    "24":    9.602336,
+    "25":    3.397563,
+    "26":    8.331652,
+    "27":    5.101465,
+    "28":    3.664422,
+    "29":   10.503913,
+    "30":    7.411616,
+    "32":   35.002515,
+    "33":    8.477962,
+    "34":    6.342501,
+    "35":   15.776036,
+    "2296":  1.447843,
+    "2297":  1.800016,
+    "2408":  3.150591
+}
+
+# Erie County sites excluded as outliers
+ERIE_OUTLIER_PLANTS = [
+    "NWSS_ny_1012_Treatment plant_raw wastewater",
+    "NWSS_ny_1013_Treatment plant_raw wastewater",
+    "NWSS_ny_1000_Treatment plant_raw wastewater",
+    "NWSS_ny_2178_Treatment plant_raw wastewater",
+    "NWSS_ny_998_Treatment plant_raw wastewater"
+]
+
+# State code -> name for NWSS jurisdictions (DC only if present)
+ABBR_TO_NAME = {
+    "AL":"Alabama","AK":"Alaska","AZ":"Arizona","AR":"Arkansas","CA":"California","CO":"Colorado",
+    "CT":"Connecticut","DE":"Delaware","FL":"Florida","GA":"Georgia","HI":"Hawaii","ID":"Idaho",
+    "IL":"Illinois","IN":"Indiana","IA":"Iowa","KS":"Kansas","KY":"Kentucky","LA":"Louisiana",
+    "ME":"Maine","MD":"Maryland","MA":"Massachusetts","MI":"Michigan","MN":"Minnesota","MS":"Mississippi",
+    "MO":"Missouri","MT":"Montana","NE":"Nebraska","NV":"Nevada","NH":"New Hampshire","NJ":"New Jersey",
+    "NM":"New Mexico","NY":"New York","NC":"North Carolina","ND":"North Dakota","OH":"Ohio","OK":"Oklahoma",
+    "OR":"Oregon","PA":"Pennsylvania","RI":"Rhode Island","SC":"South Carolina","SD":"South Dakota",
+    "TN":"Tennessee","TX":"Texas","UT":"Utah","VT":"Vermont","VA":"Virginia","WA":"Washington",
+    "WV":"West Virginia","WI":"Wisconsin","WY":"Wyoming",
+    "DC":"District of Columbia"  # only if present
+}
+
+# Load state population estimates (keep identical to legacy)
+STATE_POPULATION_ESTIMATES = {
+    'Alabama': 5024279, 'Alaska': 733391, 'Arizona': 7151502, 'Arkansas': 3011524,
+    'California': 39538223, 'Colorado': 5773714, 'Connecticut': 3605944, 'Delaware': 989948,
+    'Florida': 21538187, 'Georgia': 10711908, 'Hawaii': 1455271, 'Idaho': 1839106,
+    'Illinois': 12812508, 'Indiana': 6785528, 'Iowa': 3190369, 'Kansas': 2937880,
+    'Kentucky': 4505836, 'Louisiana': 4657757, 'Maine': 1362359, 'Maryland': 6177224,
+    'Massachusetts': 7029917, 'Michigan': 10077331, 'Minnesota': 5706494, 'Mississippi': 2961279,
+    'Missouri': 6154913, 'Montana': 1084225, 'Nebraska': 1961504, 'Nevada': 3104614,
+    'New Hampshire': 1377529, 'New Jersey': 9288994, 'New Mexico': 2117522, 'New York': 20201249,
+    'North Carolina': 10439388, 'North Dakota': 779094, 'Ohio': 11799448, 'Oklahoma': 3959353,
+    'Oregon': 4237256, 'Pennsylvania': 13002700, 'Rhode Island': 1097379, 'South Carolina': 5118425,
+    'South Dakota': 886667, 'Tennessee': 6910840, 'Texas': 29145505, 'Utah': 3271616,
+    'Vermont': 643077, 'Virginia': 8631393, 'Washington': 7693612, 'West Virginia': 1793716,
+    'Wisconsin': 5893718, 'Wyoming': 576851
+}
+
+# State abbreviations → full names (Biobot 'Region' carries 2-letter codes or 'Nationwide')
+STATE_ABBREVIATIONS = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
+    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
+    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri',
+    'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
+    'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio',
+    'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
+}
+
+# State -> 2-letter abbreviations (Joe's file)
+STATE_NAME_TO_ABBREVIATION = {
+    'Alabama': 'AL', 'Alaska': 'AK', 'Arizona': 'AZ', 'Arkansas': 'AR', 'California': 'CA',
+    'Colorado': 'CO', 'Connecticut': 'CT', 'Delaware': 'DE', 'Florida': 'FL', 'Georgia': 'GA',
+    'Hawaii': 'HI', 'Idaho': 'ID', 'Illinois': 'IL', 'Indiana': 'IN', 'Iowa': 'IA', 'Kansas': 'KS',
+    'Kentucky': 'KY', 'Louisiana': 'LA', 'Maine': 'ME', 'Maryland': 'MD', 'Massachusetts': 'MA',
+    'Michigan': 'MI', 'Minnesota': 'MN', 'Mississippi': 'MS', 'Missouri': 'MO', 'Montana': 'MT',
+    'Nebraska': 'NE', 'Nevada': 'NV', 'New Hampshire': 'NH', 'New Jersey': 'NJ', 'New Mexico': 'NM',
+    'New York': 'NY', 'North Carolina': 'NC', 'North Dakota': 'ND', 'Ohio': 'OH', 'Oklahoma': 'OK',
+    'Oregon': 'OR', 'Pennsylvania': 'PA', 'Rhode Island': 'RI', 'South Carolina': 'SC',
+    'South Dakota': 'SD', 'Tennessee': 'TN', 'Texas': 'TX', 'Utah': 'UT', 'Vermont': 'VT',
+    'Virginia': 'VA', 'Washington': 'WA', 'West Virginia': 'WV', 'Wisconsin': 'WI', 'Wyoming': 'WY'
+}
+
+# Biobot calibration scenarios run over the same NWSS aggregate.
+# Each one reads its own Biobot history and writes its own WHN, Joe and QC files.
+SCENARIOS = [
+    {
+        "name": "cleaned",
+        "biobot_file": "United_States_states_cleaned.csv",
+        "wwb_output": "United_States_wwb",
+        "joe_output": "Joe_EstimatedInfections.csv",
+        "qc_output": "United_States_wwb_qc",
+    },
+    {
+        "name": "min",
+        "biobot_file": "United_States_states_min.csv",
+        "wwb_output": "United_States_min_wwb",
+        "joe_output": "Joe_EstimatedInfections_min.csv",
+        "qc_output": "United_States_min_wwb_qc",
+    },
+]
+
+# Also write <wwb_output>_columnar.json (column arrays + region/measure dictionaries)
+COLUMNAR_JSON = os.environ.get("WW_COLUMNAR_JSON", "0") == "1"
+
+# Sites that reported within this window are extended to the most recent date
+TWO_WEEKS = pd.Timedelta(weeks=2)
+
+# Trailing-median outlier filter: a sample is dropped when it exceeds
+# OUTLIER_THRESHOLD_FACTOR x the median of its site's last OUTLIER_WINDOW samples
+OUTLIER_WINDOW = 5
+OUTLIER_MIN_PERIODS = 3
+OUTLIER_THRESHOLD_FACTOR = 10
+
+# Columns stored as categoricals in the cache of the cleaned frame
+CLEAN_CATEGORICAL_COLS = ["key_plot_id", "State"]
+
+# Bump whenever clean_nwss_raw or its constants (e.g. ARIZONA_METHOD6_DIVISORS) change,
+# so that cached cleaned frames of the old logic are not reused
+CLEAN_VERSION = 1
+
+
+def clean_nwss_raw(nwss_raw):
+    """Turn raw j9g8-acpt rows into the legacy site-level frame (Date, key_plot_id, gc/capita/day, Population, State)."""
+    # Backward-compatible rename if CDC changed column names
+    nwss_raw = nwss_raw.rename(columns={
+        "site": "sewershed_id",
+        "state_territory": "wwtp_jurisdiction"
+    })
+
+    # Basic schema checks (fail fast if CDC changes names)
+    needed_cols = [
+        "sample_collect_date",
+        "sewershed_id",
+        "wwtp_jurisdiction",
+        "population_served",
+        "sample_matrix",
+        "major_lab_method",
+        "pcr_target_flowpop_lin"
+    ]
+
+    missing = [c for c in needed_cols if c not in nwss_raw.columns]
+    if missing:
+        raise RuntimeError(f"CDC schema missing required columns: {missing}")
+
+    # Parse types
+    nwss_raw["sample_collect_date"]   = pd.to_datetime(nwss_raw["sample_collect_date"], errors="coerce")
+    nwss_raw["pcr_target_flowpop_lin"] = pd.to_numeric(nwss_raw["pcr_target_flowpop_lin"], errors="coerce")
+    nwss_raw["population_served"]      = pd.to_numeric(nwss_raw["population_served"], errors="coerce")
+    nwss_raw["major_lab_method"] = (
+        nwss_raw["major_lab_method"]
+        .astype(str)
+        .str.strip()
+    )
+
+    nwss_raw["sewershed_id"] = (
+        nwss_raw["sewershed_id"]
+        .astype(str)
+        .str.strip()
+    )
+
+    # -------------------------------------------------------------------
+    # Filter to influent-like matrices (exclude sludges/effluents)
+    # Keeping: raw wastewater, post grit removal
+    # -------------------------------------------------------------------
+    influent_keep = {"raw wastewater", "post grit removal"}
+    mat = nwss_raw["sample_matrix"].astype(str).str.lower()
+    nwss_raw = nwss_raw[mat.isin(influent_keep)]
+
+    # Drop rows missing core fields
+    nwss_raw = nwss_raw.dropna(subset=["sample_collect_date", "sewershed_id", "pcr_target_flowpop_lin"])
+
+    # -------------------------------------------------------------------
+    # Rename to EXACT legacy column names
+    #   Date, key_plot_id, gc/capita/day, State, Population
+    # -------------------------------------------------------------------
+    nwss_data = nwss_raw.rename(columns={
+        "sample_collect_date":    "Date",
+        "sewershed_id":           "key_plot_id",
+        "pcr_target_flowpop_lin": "gc/capita/day",
+        "wwtp_jurisdiction":      "State",
+        "population_served":      "Population"
+    })[
+        [
+            "Date",
+            "key_plot_id",
+            "gc/capita/day",
+            "State",
+            "Population",
+            "major_lab_method"
+        ]
+    ].copy()
+
+    # -------------------------------------------------------------------
+    # Provisional Arizona method-6 harmonization
+    #
+    # Central scenario:
+    # - Allow for an approximately 2x genuine Arizona wave
+    # - Use direct same-day overlap factors for sites 2296 and 2297
+    #
+    # Apply before duplicate averaging, outlier filtering,
+    # interpolation, and state aggregation.
+    # -------------------------------------------------------------------
+    nwss_data["key_plot_id"] = (
+        nwss_data["key_plot_id"]
+        .astype(str)
+        .str.strip()
+    )
+
+    nwss_data["major_lab_method"] = (
+        nwss_data["major_lab_method"]
+        .astype(str)
+        .str.strip()
+    )
+
+    nwss_data["Arizona_Method6_Divisor"] = (
+        nwss_data["key_plot_id"]
+        .map(ARIZONA_METHOD6_DIVISORS)
+    )
+
+    state_normalized = (
+        nwss_data["State"]
+        .astype(str)
+        .str.strip()
+        .str.lower()
+    )
+
+    arizona_method6_mask = (
+        state_normalized.isin(["az", "arizona"])
+        & nwss_data["major_lab_method"].eq("6")
+        & nwss_data["Date"].ge(
+            pd.Timestamp("2024-11-01")
+        )
+        & nwss_data["Arizona_Method6_Divisor"].notna()
+    )
+
+    # Keep the original value temporarily for audit output
+    nwss_data["Original_gc_per_capita_day"] = (
+        nwss_data["gc/capita/day"]
+    )
+
+    nwss_data.loc[
+        arizona_method6_mask,
+        "gc/capita/day"
+    ] = (
+        nwss_data.loc[
+            arizona_method6_mask,
+            "Original_gc_per_capita_day"
+        ]
+        / nwss_data.loc[
+            arizona_method6_mask,
+            "Arizona_Method6_Divisor"
+        ]
+    )
+
+
+    # Temporary audit output
+    adjusted_rows = nwss_data.loc[
+        arizona_method6_mask
+    ].copy()
+
+    print("\nArizona method-6 adjustment audit:")
+    print("Adjusted rows:", len(adjusted_rows))
+    print(
+        "Adjusted sites:",
+        adjusted_rows["key_plot_id"].nunique()
+    )
+
+    print(
+        "First adjusted date:",
+        adjusted_rows["Date"].min()
+    )
+
+    print(
+        "Last adjusted date:",
+        adjusted_rows["Date"].max()
+    )
+
+    print("\nAdjusted observations by site:")
+    print(
+        adjusted_rows.groupby("key_plot_id")
+        .agg(
+            Rows=("Date", "size"),
+            First_Date=("Date", "min"),
+            Last_Date=("Date", "max"),
+            Divisor=(
+                "Arizona_Method6_Divisor",
+                "first"
+            ),
+            Median_Original=(
+                "Original_gc_per_capita_day",
+                "median"
+            ),
+            Median_Adjusted=(
+                "gc/capita/day",
+                "median"
+            )
+        )
+        .sort_values(
+            "Median_Original",
+            ascending=False
+        )
+        .to_string()
+    )
+
+    # Remove negative values (defensive, should rarely occur)
+    nwss_data["gc/capita/day"] = nwss_data["gc/capita/day"].clip(lower=0)
+
+    # Average duplicate dates for each treatment plant (aligning with previous behavior)
+    nwss_data = (
+        nwss_data
+        .groupby(["key_plot_id", "Date"], as_index=False)
+        .agg({
+            "gc/capita/day": "mean",
+            "Population": "mean",
+            "State": "first"
+        })
+    )
+
+    return nwss_data
+
+
+# -------------------------------------------------------------------
+# Columnar cache of the cleaned frame
+#
+# The cleaned frame is kept in one uncompressed Arrow file, memory-mapped on
+# reuse, so a rerun does not clean j9g8-acpt again when nothing changed. The
+# file is keyed on the ingest watermark (after this run's incremental fetch)
+# and CLEAN_VERSION: new or revised rows, or a change of the cleaning logic,
+# give a new key.
+# -------------------------------------------------------------------
+def clean_cache_key(watermark, clean_version=CLEAN_VERSION):
+    """Short hash of the ingest watermark and the cleaning version."""
+    payload = json.dumps({"clean_version": clean_version, "watermark": watermark}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _clean_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"nwss_clean_{key}.arrow")
+
+
+def _to_cache_dtypes(nwss_data):
+    nwss_data = nwss_data.copy()
+    nwss_data["Date"] = pd.to_datetime(nwss_data["Date"])
+    for col in CLEAN_CATEGORICAL_COLS:
+        nwss_data[col] = nwss_data[col].astype("category")
+    return nwss_data
+
+
+def load_clean_nwss(cache_dir=STORE_DIR, refresh=False):
+    """Return the cleaned NWSS frame, from the cache file of the current watermark when it exists."""
+    nwss_raw = fetch_nwss_raw(store_dir=cache_dir)
+    cache_path = _clean_cache_path(cache_dir, clean_cache_key(read_watermark(cache_dir)))
+
+    if os.path.exists(cache_path) and not refresh:
+        print(f"NWSS cleaned frame: memory-mapping {cache_path}")
+        return feather.read_table(cache_path, memory_map=True).to_pandas()
+
+    nwss_data = _to_cache_dtypes(clean_nwss_raw(nwss_raw))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    table = pa.Table.from_pandas(nwss_data, preserve_index=False)
+    # Uncompressed so that later readers can memory-map the file
+    feather.write_feather(table, cache_path + ".tmp", compression="uncompressed")
+    os.replace(cache_path + ".tmp", cache_path)
+    # Keep only the current file
+    for name in os.listdir(cache_dir):
+        if name.startswith("nwss_clean_") and name.endswith(".arrow") and name != os.path.basename(cache_path):
+            os.remove(os.path.join(cache_dir, name))
+    return nwss_data
+
+
+# -------------------------------------------------------------------
+# Site outliers, interpolation and state/national aggregation
+# -------------------------------------------------------------------
+def trailing_median(values, group_codes, window, min_periods):
+    """Trailing rolling median of `values` within each group, for all groups in one pass.
+
+    Rows must be sorted by group, then time. Matches pandas' rolling(window, min_periods)
+    .median() per group: NaNs are skipped and fewer than min_periods values give NaN.
+    """
+    n = len(values)
+    # Column `lag` of each row holds the value `lag` rows back, NaN across a group boundary
+    windows = np.full((n, window), np.nan)
+    for lag in range(min(window, n)):
+        same_group = group_codes[lag:] == group_codes[:n - lag]
+        windows[lag:, lag] = np.where(same_group, values[:n - lag], np.nan)
+
+    counts = (~np.isnan(windows)).sum(axis=1)
+    windows.sort(axis=1)  # NaNs sort last, so the valid values lead each row
+    rows = np.arange(n)
+    lower = windows[rows, np.maximum(counts - 1, 0) // 2]
+    upper = windows[rows, counts // 2]
+    return np.where(counts >= min_periods, (lower + upper) / 2, np.nan)
+
+
+def flag_site_outliers(nwss_data):
+    """Flag samples far above their site's trailing local median.
+
+    Returns (is_outlier, outliers_by_site): a boolean Series aligned with nwss_data and the
+    number of flagged samples per key_plot_id.
+    """
+    site_codes = pd.factorize(nwss_data["key_plot_id"])[0]
+    # Sort once by site, then date
+    order = np.lexsort((nwss_data["Date"].to_numpy(), site_codes))
+    values = nwss_data["gc/capita/day"].to_numpy(dtype="float64")[order]
+    rolling_median = trailing_median(values, site_codes[order], OUTLIER_WINDOW, OUTLIER_MIN_PERIODS)
+
+    # Only flag where rolling_median is available
+    flagged = ~np.isnan(rolling_median) & (values > OUTLIER_THRESHOLD_FACTOR * rolling_median)
+    is_outlier = np.zeros(len(nwss_data), dtype=bool)
+    is_outlier[order] = flagged
+    is_outlier = pd.Series(is_outlier, index=nwss_data.index, name="is_outlier")
+
+    outliers_by_site = is_outlier.groupby(nwss_data["key_plot_id"], observed=True).sum().rename("Outliers")
+    return is_outlier, outliers_by_site
+
+
+def filter_site_outliers(nwss_data):
+    """Drop the excluded Erie County sites and samples far above their trailing local median."""
+    # -------------------------------------------------------------------
+    # Keep Erie County outlier site exclusions (unchanged)
+    # -------------------------------------------------------------------
+    nwss_data = nwss_data[~nwss_data["key_plot_id"].isin(ERIE_OUTLIER_PLANTS)].reset_index(drop=True)
+
+    # -------------------------------------------------------------------
+    # Outlier filtering vs trailing local median
+    # -------------------------------------------------------------------
+    is_outlier, outliers_by_site = flag_site_outliers(nwss_data)
+    flagged_sites = outliers_by_site[outliers_by_site > 0]
+    print(f"\nOutlier filter: {int(is_outlier.sum())} samples flagged at {len(flagged_sites)} sites")
+    if len(flagged_sites):
+        print("Most flagged sites:")
+        print(flagged_sites.sort_values(ascending=False).head(20).to_string())
+
+    return nwss_data[~is_outlier.to_numpy()]
+
+
+def interpolate_rows(values):
+    """Linearly fill NaN gaps along axis 1 of a 2-D array, one row per site.
+
+    Matches pandas' interpolate(method="linear") row by row (same arithmetic as np.interp):
+    gaps between two valid values are interpolated, NaNs after the last valid value take
+    that value, and NaNs before the first valid value are left as NaN.
+    """
+    n_rows, n_cols = values.shape
+    cols = np.arange(n_cols)
+    rows = np.arange(n_rows)[:, None]
+    valid = ~np.isnan(values)
+
+    # Position of the previous and next valid value in each row (-1 / n_cols when none)
+    prev = np.maximum.accumulate(np.where(valid, cols, -1), axis=1)
+    nxt = np.minimum.accumulate(np.where(valid, cols, n_cols)[:, ::-1], axis=1)[:, ::-1]
+    y0 = values[rows, np.maximum(prev, 0)]
+    y1 = values[rows, np.minimum(nxt, n_cols - 1)]
+
+    out = values.copy()
+    inner = ~valid & (prev >= 0) & (nxt < n_cols)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (y1 - y0) / (nxt - prev)
+        out[inner] = (slope * (cols - prev) + y0)[inner]
+    trailing = ~valid & (prev >= 0) & (nxt == n_cols)
+    out[trailing] = y0[trailing]
+    return out
+
+
+def interpolate_sites(nwss_data):
+    """Reindex every site to daily values and interpolate between samples.
+
+    All sites are filled at once on a dense site x day grid. A site's span runs from its
+    first sample to its last one, or to the overall most recent date when it reported
+    within the last two weeks. Returns the site matrix:
+
+      dates            daily DatetimeIndex (columns of every matrix)
+      sites            key_plot_id of each row
+      gc, population   interpolated gc/capita/day and Population (sites x days)
+      in_range         True inside each site's span (sites x days)
+      state            full state name of each site (from its most recent sample)
+      site_population  population served at each site's most recent sample
+      last_report      date of each site's most recent sample
+    """
+    overall_most_recent_date = nwss_data["Date"].max()
+    first_date = nwss_data["Date"].min()
+    n_days = (overall_most_recent_date - first_date).days + 1
+
+    site_codes, sites = pd.factorize(nwss_data["key_plot_id"], sort=True)
+    day = (nwss_data["Date"] - first_date).dt.days.to_numpy()
+    n_sites = len(sites)
+    rows = np.arange(n_sites)
+    days = np.arange(n_days)
+
+    gc = np.full((n_sites, n_days), np.nan)
+    gc[site_codes, day] = nwss_data["gc/capita/day"].to_numpy(dtype="float64")
+    population = np.full((n_sites, n_days), np.nan)
+    population[site_codes, day] = nwss_data["Population"].to_numpy(dtype="float64")
+    observed = np.zeros((n_sites, n_days), dtype=bool)
+    observed[site_codes, day] = True
+
+    # Extend recent sites to the overall most recent date (two-week rule)
+    site_first = observed.argmax(axis=1)
+    site_last = n_days - 1 - observed[:, ::-1].argmax(axis=1)
+    extend = (n_days - 1 - site_last) <= TWO_WEEKS.days
+    site_end = np.where(extend, n_days - 1, site_last)
+    in_range = (days >= site_first[:, None]) & (days <= site_end[:, None])
+
+    gc = interpolate_rows(gc)
+    population = interpolate_rows(population)
+    gc[~in_range] = np.nan
+    population[~in_range] = np.nan
+
+    # Site state: the most recent sample that reported one, as a full state name
+    state_codes, states = pd.factorize(
+        nwss_data["State"].astype(str).str.strip().str.upper().map(ABBR_TO_NAME).fillna(nwss_data["State"])
+    )
+    state_grid = np.full((n_sites, n_days), -1)
+    state_grid[site_codes, day] = state_codes
+    last_state_day = np.where(state_grid >= 0, days, -1).max(axis=1)
+    site_state_codes = np.where(last_state_day >= 0, state_grid[rows, np.maximum(last_state_day, 0)], -1)
+
+    return {
+        "dates": pd.date_range(first_date, periods=n_days, freq="D"),
+        "sites": sites,
+        "gc": gc,
+        "population": population,
+        "in_range": in_range,
+        "state": pd.api.extensions.take(np.asarray(states, dtype=object), site_state_codes, allow_fill=True),
+        "site_population": population[rows, site_last],
+        "last_report": first_date + pd.to_timedelta(site_last, unit="D"),
+    }
+
+
+def _state_reductions(site_matrix):
+    """Reduce the site matrix to state x day tables of weighted signal, plant count and population."""
+    state_codes, state_names = pd.factorize(site_matrix["state"], sort=True)
+    # Rows grouped by state (stable, so sites stay in key_plot_id order); sites without a state drop out
+    order = np.argsort(state_codes, kind="stable")
+    order = order[state_codes[order] >= 0]
+    starts = np.searchsorted(state_codes[order], np.arange(len(state_names)))
+
+    in_range = site_matrix["in_range"][order]
+    gc = site_matrix["gc"][order]
+    population = site_matrix["population"][order]
+
+    # NaN-skipping column sums over each state's block of rows, one reduction for all states
+    weighted_sum = np.add.reduceat(np.nan_to_num(gc * population), starts, axis=0)
+    population_covered = np.add.reduceat(np.nan_to_num(population), starts, axis=0)
+    contributing_plants = np.add.reduceat(in_range.astype("int64"), starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weighted = weighted_sum / population_covered
+    return state_names, weighted, contributing_plants, population_covered
+
+
+def aggregate_states(site_matrix):
+    """Population-weighted state signal plus national roll-up; returns (state table, state + Nationwide table).
+
+    Both tables come out of one pass over the site matrix: the state x day reductions give
+    the state rows, and summing those reductions over states gives the Nationwide row of
+    each date.
+    """
+    state_names, weighted, contributing_plants, population_covered = _state_reductions(site_matrix)
+    dates = site_matrix["dates"]
+
+    # State rows: every state and date with at least one contributing plant
+    state_idx, day_idx = np.nonzero(contributing_plants > 0)
+    state_aggregated_with_full_population = pd.DataFrame({
+        'State': state_names[state_idx],
+        'Date': dates[day_idx],
+        'Weighted_gc/capita/day': weighted[state_idx, day_idx],
+        'Contributing_Plants': contributing_plants[state_idx, day_idx],
+        'Population_Covered': population_covered[state_idx, day_idx],
+    })
+    state_aggregated_with_full_population['State_Population'] = (
+        state_aggregated_with_full_population['State'].map(STATE_POPULATION_ESTIMATES)
+    )
+    state_aggregated_with_full_population['Percentage_Covered'] = (
+        state_aggregated_with_full_population['Population_Covered']
+        / state_aggregated_with_full_population['State_Population'] * 100
+    )
+
+    # Apply a centered 7-day rolling average to smooth the data (per state)
+    state_aggregated_with_full_population['Smoothed_gc/capita/day'] = (
+        state_aggregated_with_full_population
+        .groupby('State')['Weighted_gc/capita/day']
+        .rolling(window=7, center=True, min_periods=1).mean()
+        .reset_index(level=0, drop=True)
+    )
+
+    # Nationwide rows: the state reductions summed over states, keyed on Date
+    national_days = np.flatnonzero((contributing_plants > 0).any(axis=0))
+    national_population_covered = population_covered[:, national_days].sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        national_weighted = (
+            np.nan_to_num(weighted * population_covered)[:, national_days].sum(axis=0)
+            / national_population_covered
+        )
+    national_aggregated = pd.DataFrame({
+        'State': 'Nationwide',
+        'Date': dates[national_days],
+        'Weighted_gc/capita/day': national_weighted,
+        'Contributing_Plants': contributing_plants[:, national_days].sum(axis=0),
+        'Population_Covered': national_population_covered,
+        # Constant total US population (sum of the per-state constants)
+        'State_Population': sum(STATE_POPULATION_ESTIMATES.values()),
+    })
+    national_aggregated['Percentage_Covered'] = (
+        national_aggregated['Population_Covered']
+        / national_aggregated['State_Population'] * 100
+    )
+    national_aggregated['Smoothed_gc/capita/day'] = (
+        national_aggregated['Weighted_gc/capita/day']
+        .rolling(window=7, center=True, min_periods=1).mean()
+    )
+
+    # Merge national + state-level rows (same schema as before)
+    merged_data = pd.concat(
+        [state_aggregated_with_full_population, national_aggregated],
+        ignore_index=True, sort=False
+    )
+    return state_aggregated_with_full_population, merged_data
+
+
+def compute_nwss_aggregates():
+    """Run the scenario-independent NWSS chain: fetch/clean (cached), outliers, interpolation, aggregation."""
+    nwss_data = filter_site_outliers(load_clean_nwss())
+    return aggregate_states(interpolate_sites(nwss_data))
+
+
+def extend_wwb_rows(merged_data, biobot_data_inf, regions, state_conversion_factors):
+    """Long Country/Region/Date/Measure/Value rows that extend each region past its Biobot history.
+
+    For every region (in the given order) and every NWSS date after the region's last Biobot
+    INF date, emits a wastewater row (smoothed gc/capita/day) followed by an inf row (the
+    same value ÷ the region's conversion factor).
+    """
+    regions_df = pd.DataFrame({
+        'State': regions,
+        'Region_Order': range(len(regions)),
+        'Last_Biobot_Date': biobot_data_inf.groupby('State')['Date'].max().reindex(regions).to_numpy(),
+        'Conversion_Factor': [state_conversion_factors[region] for region in regions],
+    })
+    extension = pd.merge(
+        merged_data[['State', 'Date', 'Smoothed_gc/capita/day']], regions_df, on='State', how='inner'
+    )
+    extension = (
+        extension[extension['Date'] > extension['Last_Biobot_Date']]
+        .sort_values(['Region_Order', 'Date'], kind='stable')
+    )
+
+    # Two rows per region and date: wastewater, then inf
+    smoothed = extension['Smoothed_gc/capita/day'].to_numpy()
+    return pd.DataFrame({
+        'Country': 'United_States',
+        'Region': np.repeat(extension['State'].to_numpy(), 2),
+        'Date': np.repeat(extension['Date'].to_numpy(), 2),
+        'Measure': np.tile(['wastewater', 'inf'], len(extension)),
+        'Value': np.column_stack([smoothed, smoothed / extension['Conversion_Factor'].to_numpy()]).ravel(),
+    })
+
+
+def joe_infections_pivot(final_merged_data):
+    """Date x Region infections for Joe (MAPS): Nationwide first, then state abbreviations A–Z.
+
+    Regions in the WHN file keep their own inf series; every state missing from it gets the
+    Nationwide series apportioned by its share of the US population.
+    """
+    # Existing inf series, one column per region present
+    df_inf = final_merged_data[final_merged_data['Measure'] == 'inf']
+    existing = df_inf.pivot(index='Date', columns='Region', values='Value').sort_index()
+
+    # States not in the dataset: Nationwide x population share, all at once
+    nationwide_population = sum(STATE_POPULATION_ESTIMATES.values())
+    missing_states = [state for state in STATE_POPULATION_ESTIMATES if state not in existing.columns]
+    shares = np.array([STATE_POPULATION_ESTIMATES[state] / nationwide_population for state in missing_states])
+    apportioned = existing['Nationwide'].to_numpy()[:, None] * shares[None, :]
+
+    # Fill a preallocated matrix in the published column order (two-letter abbreviations)
+    existing_cols = [STATE_NAME_TO_ABBREVIATION.get(region, region) for region in existing.columns]
+    missing_cols = [STATE_NAME_TO_ABBREVIATION[state] for state in missing_states]
+    cols = ['Nationwide'] + sorted(c for c in existing_cols + missing_cols if c != 'Nationwide')
+    col_index = pd.Index(cols, name='Region')
+    values = np.full((len(existing.index), len(cols)), np.nan)
+    values[:, col_index.get_indexer(existing_cols)] = existing.to_numpy()
+    values[:, col_index.get_indexer(missing_cols)] = apportioned
+    return pd.DataFrame(values, index=existing.index, columns=col_index)
+
+
+def run_scenario(state_aggregated_with_full_population, merged_data, scenario):
+    """Calibrate the shared NWSS aggregate against one Biobot file and write that scenario's outputs."""
+    print(f"\n=== Scenario: {scenario['name']} ({scenario['biobot_file']}) ===")
+
+    # Load the Biobot data (unchanged)
+    biobot_file_path = scenario['biobot_file']
+    biobot_data = pd.read_csv(biobot_file_path)
+    biobot_data['Date'] = pd.to_datetime(biobot_data['Date'], errors='coerce')
+
+    # --- PART 3: Biobot-based conversion factors (keep legacy behavior) ---
+
+    # Convert state abbreviations to full names for calibration (keep 'Nationwide' untouched)
+    biobot_states = biobot_data.assign(
+        State = biobot_data['Region'].map(STATE_ABBREVIATIONS).fillna(biobot_data['Region'])
+    )
+    biobot_window = biobot_states[lookback_mask(biobot_states)]
+
+    # Conversion factors: NWSS (smoothed gc/capita/day) ÷ Biobot, per measure and state
+    factors = conversion_factors(merged_data, biobot_window)
+    state_conversion_factors = factors.get('inf', {})
+    state_conversion_factors_wastewater = factors.get('wastewater', {})
+    print_factors(state_conversion_factors)
+    print_factors(state_conversion_factors_wastewater, "Wastewater Conversion Factor")
+
+    # Biobot INF rows, and those inside the look-back window (used for gating below)
+    biobot_data_inf = biobot_states[biobot_states['Measure'] == 'inf']
+    biobot_data_last_months = biobot_window[biobot_window['Measure'] == 'inf']
+
+    # Apply the mapping to the 'Region' column (keep legacy behavior)
+    biobot_data = biobot_data.copy()
+    biobot_data['Region'] = biobot_data['Region'].map(STATE_ABBREVIATIONS).fillna(biobot_data['Region'])
+
+    # Step 2: Replace 'Value' for 'wastewater' measure using the conversion factors (default 1 if missing)
+    biobot_data, fallback_regions = rescale_wastewater(biobot_data, state_conversion_factors_wastewater)
+    if fallback_regions:
+        print(f"Wastewater rescaling: no conversion factor for {', '.join(fallback_regions)}; kept factor 1")
+
+    # ---- Data-quality gating / filtered states (unchanged thresholds) ----
+    qc = qc_table(state_aggregated_with_full_population, merged_data, biobot_data_last_months, state_conversion_factors)
+    filtered_states = qc.loc[qc['Passed'], 'State'].tolist()
+    print("\nData-quality gating:")
+    print(qc.to_string(index=False))
+
+    # Persist the QC table next to the outputs so it can be read and diffed without recomputing
+    qc.to_csv(f"{scenario['qc_output']}.csv", index=False)
+    qc.to_json(f"{scenario['qc_output']}.json", orient='records')
+
+    # --- PART 4: Build final WHN files (United_States_wwb.{csv,json}) and Joe_EstimatedInfections.csv ---
+
+    # NWSS rows extending Nationwide and each filtered state past its Biobot history
+    final_data = extend_wwb_rows(
+        merged_data, biobot_data_inf, ['Nationwide'] + filtered_states, state_conversion_factors
+    )
+
+    # Filter Biobot to only filtered states + Nationwide (keeps legacy content)
+    biobot_data_filtered = biobot_data[biobot_data['Region'].isin(filtered_states + ['Nationwide'])].copy()
+
+    # Append the NWSS extension to Biobot
+    final_merged_data = pd.concat([biobot_data_filtered, final_data], ignore_index=True)
+
+    # Save WHN wastewater+inf dataset exactly as before
+    final_merged_data.to_csv(f"{scenario['wwb_output']}.csv", index=False)
+    write_records_json(final_merged_data, f"{scenario['wwb_output']}.json")
+    if COLUMNAR_JSON:
+        write_columnar_json(final_merged_data, f"{scenario['wwb_output']}_columnar.json")
+    # One small file per Region x Measure (plus manifest) for pages that plot a single series
+    write_partitioned_json(final_merged_data, f"{scenario['wwb_output']}_parts")
+
+    # -----------------------
+    # For Joe (MAPS) — pivoted infections by region
+    # -----------------------
+
+    df_pivot = joe_infections_pivot(final_merged_data)
+
+    # Save Joe’s file
+    df_pivot.to_csv(scenario['joe_output'])
+
+    print(f"Scenario {scenario['name']} saved: {scenario['wwb_output']}.csv/.json and {scenario['joe_output']}")
@@ -1,11 +1,15 @@
 import pandas as pd
 import requests
 import os
+import sys
 from pathlib import Path
 from datetime import datetime, timedelta
-from math import log10, floor
 from json import loads, dumps
 
+# Shared helpers live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from ww_utils import conversion_factor_schedule, round_significant  # noqa: E402
+
 def download_rki_data_file(base_url, folder, file_path_disk):
     # Attempt to download the file
     response = requests.get(base_url)
@@ -21,41 +25,6 @@ def download_rki_data_file(base_url, folder, file_path_disk):
 
     return "No file found in the specified url", None
 
-# Returns the correct conversion factor for a date passed in
-def conversion_factor(date):
-    # Conversion factor based on ihme and biobot data for the first 5 months of 2021 when testing was good and correlation was over 0.99
-    cf = 915.6749186924305 
-    # Define the transition periods
-    start_date_omicron = pd.Timestamp('2021-12-17')
-    end_date_omicron = start_date_omicron + pd.Timedelta(days=30)
-    start_date_post_omicron = pd.Timestamp('2022-08-01')  # Start date for the second transition
-    end_date_post_omicron = start_date_post_omicron + pd.Timedelta(days=30)
-
-    if date < start_date_omicron:
-        return cf  # Before Omicron
-    elif start_date_omicron <= date <= end_date_omicron:
-        # Linear interpolation for the first transition
-        proportion = (date - start_date_omicron) / pd.Timedelta(days=30)
-        return cf + proportion * ((cf * 1.53) - cf)
-    elif end_date_omicron < date < start_date_post_omicron:
-        # After first transition, before second
-        return cf * 1.53
-    elif start_date_post_omicron <= date <= end_date_post_omicron:
-        # Linear interpolation for the second transition
-        proportion = (date - start_date_post_omicron) / pd.Timedelta(days=30)
-        return (cf * 1.53) + proportion * ((cf * 2.28) - (cf * 1.53))
-    else:
-        return cf * 2.28  # After the second transition
-
-# Define a function to round a number to two significant digits
-def round_to_two_significant_digits(num):
-    if num == 0:
-        return 0
-    else:
-        # Calculate the number of digits to round to
-        round_digits = -int(floor(log10(abs(num)))) + 1
-        # Round the number
-        return round(num, round_digits)
     
 if __name__ == "__main__":
     # Base URL and other parameters
@@ -88,12 +57,8 @@ if __name__ == "__main__":
 
     cf = 915.6749186924305 # Conversion factor based on ihme and biobot data for the first 5 months of 2021 when testing was good and correlation was over 0.99
 
-    infections = []
-    for index, row in df_en.iterrows():
-        infection_level = row['viruslast'] * conversion_factor(row['Date'])
-        infections.append(infection_level)
-    
-    df_en = df_en.assign(estimated_infections=infections)
+    # Omicron / post-Omicron transitions applied to all rows at once
+    df_en = df_en.assign(estimated_infections=df_en['viruslast'] * conversion_factor_schedule(df_en['Date'], cf))
     print("done")
 
     # Get all the different regions in the dataframe 
@@ -110,9 +75,10 @@ if __name__ == "__main__":
         df_region_avg.insert(1, "Country", "Germany")        
         df_regions.append(df_region_avg)
         # Fill in json list for the regions
-        for index, row in df_region_avg.iterrows():
-            rows_list_json_regions.append({'Country': 'Germany', 'Region': region, 'Date': row.name, 'Measure': 'inf', 'Value': row['estimated_infections']})
-            rows_list_json_regions.append({'Country': 'Germany', 'Region': region, 'Date': row.name, 'Measure': 'wastewater', 'Value': round_to_two_significant_digits(row['viruslast'])})
+        wastewater_rounded = round_significant(df_region_avg['viruslast'])
+        for date, inf, wastewater in zip(df_region_avg.index, df_region_avg['estimated_infections'], wastewater_rounded):
+            rows_list_json_regions.append({'Country': 'Germany', 'Region': region, 'Date': date, 'Measure': 'inf', 'Value': inf})
+            rows_list_json_regions.append({'Country': 'Germany', 'Region': region, 'Date': date, 'Measure': 'wastewater', 'Value': wastewater})
             
     # Get a national average
     df_all_regions = pd.concat(df_regions)
@@ -124,9 +90,10 @@ if __name__ == "__main__":
     # Prepare list to generate JSON nationwide file in the required visualisation format
     rows_list_json_nationwide = []
     # First generate nationwide
-    for index, row in df_german_avg.iterrows():
-            rows_list_json_nationwide.append({'Country': 'Germany', 'Region': 'Nationwide', 'Date': row.name, 'Measure': 'inf', 'Value': row['estimated_infections']})
-            rows_list_json_nationwide.append({'Country': 'Germany', 'Region': 'Nationwide', 'Date': row.name, 'Measure': 'wastewater', 'Value': round_to_two_significant_digits(row['viruslast'])})
+    wastewater_rounded = round_significant(df_german_avg['viruslast'])
+    for date, inf, wastewater in zip(df_german_avg.index, df_german_avg['estimated_infections'], wastewater_rounded):
+            rows_list_json_nationwide.append({'Country': 'Germany', 'Region': 'Nationwide', 'Date': date, 'Measure': 'inf', 'Value': inf})
+            rows_list_json_nationwide.append({'Country': 'Germany', 'Region': 'Nationwide', 'Date': date, 'Measure': 'wastewater', 'Value': wastewater})
     # Concat lists into single dataframe
     rows_list_json = rows_list_json_nationwide + rows_list_json_regions
     combined_df = pd.concat([pd.DataFrame(rows_list_json)], ignore_index=True)
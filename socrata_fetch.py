@@ -0,0 +1,103 @@
+# Purpose: Parallel, paged Socrata downloads with column projection and typed decoding
+#
+# A single unbounded Socrata.get is split into $limit/$offset pages ordered by :id.
+# The pages are downloaded concurrently, each with retry and exponential backoff,
+# and each page is decoded into typed columns before the pages are concatenated.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from sodapy import Socrata
+
+PAGE_SIZE = 50000
+MAX_WORKERS = 4
+RETRIES = 4
+BACKOFF_SECONDS = 2.0
+
+# Transport failures worth another attempt (a dropped connection can also surface mid-body)
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+_local = threading.local()
+
+
+def _client(domain, timeout):
+    """One Socrata client (and HTTP session) per worker thread and (domain, timeout)."""
+    clients = getattr(_local, "clients", None)
+    if clients is None:
+        clients = _local.clients = {}
+    if (domain, timeout) not in clients:
+        clients[(domain, timeout)] = Socrata(domain, None, timeout=timeout)
+    return clients[(domain, timeout)]
+
+
+def _is_retryable(exc):
+    # Client errors (bad $select/$where, unknown column) will not succeed on retry
+    if isinstance(exc, RETRYABLE_ERRORS):
+        return True
+    status = getattr(exc.response, "status_code", None)
+    return status is not None and (status >= 500 or status == 429)
+
+
+def _with_retry(func, retries=RETRIES, backoff=BACKOFF_SECONDS):
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except requests.exceptions.RequestException as exc:
+            if attempt == retries or not _is_retryable(exc):
+                raise
+            wait = backoff * 2 ** attempt
+            print(f"Socrata request failed ({exc}); retrying in {wait:.0f}s")
+            time.sleep(wait)
+
+
+def decode_page(records, columns, dtypes=None):
+    """Build a DataFrame from one page of Socrata records and coerce it to typed columns.
+
+    dtypes maps a column to "datetime" or "float"; other columns stay strings.
+    """
+    page = pd.DataFrame.from_records(records, columns=columns)
+    for col, kind in (dtypes or {}).items():
+        if col not in page.columns:
+            continue
+        if kind == "datetime":
+            page[col] = pd.to_datetime(page[col], errors="coerce")
+        elif kind == "float":
+            page[col] = pd.to_numeric(page[col], errors="coerce").astype("float64")
+    return page
+
+
+def count_rows(client, dataset, where=None):
+    params = {"select": "count(*)"}
+    if where:
+        params["where"] = where
+    result = _with_retry(lambda: client.get(dataset, **params))
+    return int(next(iter(result[0].values()))) if result else 0
+
+
+def fetch_paged(domain, dataset, columns, where=None, dtypes=None, page_size=PAGE_SIZE,
+                max_workers=MAX_WORKERS, timeout=180):
+    """Download `columns` of every row matching `where` as one typed DataFrame."""
+    n_rows = count_rows(_client(domain, timeout), dataset, where)
+    offsets = list(range(0, n_rows, page_size))
+    print(f"Socrata {dataset}: {n_rows} rows in {len(offsets)} pages of {page_size}")
+
+    params = {"select": ", ".join(columns), "order": ":id", "limit": page_size}
+    if where:
+        params["where"] = where
+
+    def fetch_page(offset):
+        records = _with_retry(lambda: _client(domain, timeout).get(dataset, offset=offset, **params))
+        return decode_page(records, columns, dtypes)
+
+    if not offsets:
+        return decode_page([], columns, dtypes)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pages = list(pool.map(fetch_page, offsets))
+
+    return pd.concat(pages, ignore_index=True)
@@ -0,0 +1,115 @@
+# Purpose: Tests of the Biobot export discovery and conditional download against a local HTTP server
+import hashlib
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import biobot_download
+
+SUFFIX = "_automated_csvs/wastewater_by_county.csv"
+LAST_MODIFIED = "Fri, 16 Oct 2026 06:00:00 GMT"
+
+# Dated exports on the stand-in server (2026-10-17 and 2026-10-18 are not published)
+FILES = {
+    f"/2026-10-{day}{SUFFIX}": f"date,value\n2026-10-{day},{day}\n".encode("utf-8")
+    for day in ("09", "13", "16")
+}
+
+
+class ExportHandler(BaseHTTPRequestHandler):
+    """Serves FILES with ETag / Last-Modified, answers conditional GETs with 304 and logs every request."""
+
+    def _answer(self, with_body):
+        body = FILES.get(self.path)
+        etag = None if body is None else '"' + hashlib.md5(body).hexdigest() + '"'
+        if body is None:
+            status = 403  # CloudFront answers missing keys with 403
+        else:
+            status = 304 if self.headers.get("If-None-Match") == etag else 200
+        # Logged before answering, so the entry exists once the client has its response
+        self.server.log.append((self.command, self.path, status))
+        if body is None:
+            self.send_response(403)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(body)) if status == 200 else "0")
+        self.end_headers()
+        if with_body and status == 200:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._answer(with_body=False)
+
+    def do_GET(self):
+        self._answer(with_body=True)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ExportHandler)
+    httpd.log = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # Downloads, validators and .part files all land below the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def download(server, start_date, suffix=SUFFIX, days_back=biobot_download.DAYS_BACK):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    return biobot_download.download_latest_csv(
+        "US_Biobot_county_data_", suffix, base_url=base_url, start_date=start_date, days_back=days_back
+    )
+
+
+def gets(server):
+    return [(path, status) for command, path, status in server.log if command == "GET"]
+
+
+def test_newest_date_is_downloaded(server):
+    message, file_path = download(server, datetime(2026, 10, 18))
+
+    assert file_path == "US_Biobot_county_data_2026-10-16.csv"
+    assert "downloaded successfully" in message
+    with open(file_path, "rb") as f:
+        assert f.read() == FILES[f"/2026-10-16{SUFFIX}"]
+    assert gets(server) == [(f"/2026-10-16{SUFFIX}", 200)]
+    assert not [name for name in os.listdir(".") if name.endswith(".part")]
+
+
+def test_second_run_gets_304_and_keeps_file(server):
+    _, file_path = download(server, datetime(2026, 10, 18))
+    before = os.stat(file_path).st_mtime_ns
+    server.log.clear()
+
+    message, second_path = download(server, datetime(2026, 10, 18))
+
+    assert second_path == file_path
+    assert "unchanged" in message
+    assert gets(server) == [(f"/2026-10-16{SUFFIX}", 304)]
+    assert os.stat(file_path).st_mtime_ns == before
+
+
+def test_missing_range_returns_none(server):
+    message, file_path = download(server, datetime(2026, 10, 8), days_back=5)
+
+    assert file_path is None
+    assert message == "No CSV file found in the specified date range."
+    assert gets(server) == []
+    assert len(server.log) == 5
@@ -0,0 +1,100 @@
+# Purpose: Tests of the incremental NWSS ingest (empty pulls and the look-back window)
+import pandas as pd
+
+import nwss_ingest
+from nwss_ingest import DATE_COL, NWSS_COLUMNS, NWSS_DTYPES, ROW_ID, UPDATED_AT
+from socrata_fetch import decode_page
+
+COLUMNS = [ROW_ID, UPDATED_AT] + NWSS_COLUMNS
+
+
+def make_rows(*rows, value="5.0"):
+    """Typed raw rows like fetch_paged returns, from (id, updated_at, collect date) tuples."""
+    records = [
+        {ROW_ID: row_id, UPDATED_AT: updated_at, DATE_COL: date, "sewershed_id": "1",
+         "wwtp_jurisdiction": "VT", "population_served": "1000", "sample_matrix": "raw wastewater",
+         "major_lab_method": "1", "pcr_target_flowpop_lin": value}
+        for row_id, updated_at, date in rows
+    ]
+    return decode_page(records, COLUMNS, NWSS_DTYPES)
+
+
+STORED = make_rows(
+    ("row-1", "2025-01-02T00:00:00.000Z", "2025-01-01T00:00:00.000"),
+    ("row-2", "2025-03-02T00:00:00.000Z", "2025-03-01T00:00:00.000"),
+    ("row-3", "2025-03-11T00:00:00.000Z", "2025-03-10T00:00:00.000"),
+)
+
+
+def test_merge_empty_increment_drops_window():
+    merged = nwss_ingest.merge_increment(STORED, make_rows(), pd.Timestamp("2025-02-01"))
+
+    assert list(merged[ROW_ID]) == ["row-1"]
+    assert merged.dtypes.equals(STORED.dtypes)
+
+
+def test_merge_increment_replaces_window_and_republished_rows():
+    increment = make_rows(
+        ("row-1", "2025-03-12T00:00:00.000Z", "2025-01-01T00:00:00.000"),
+        ("row-3", "2025-03-12T00:00:00.000Z", "2025-03-10T00:00:00.000"),
+    )
+    merged = nwss_ingest.merge_increment(STORED, increment, pd.Timestamp("2025-02-01"))
+
+    assert sorted(merged[ROW_ID]) == ["row-1", "row-3"]
+    assert set(merged[UPDATED_AT]) == {"2025-03-12T00:00:00.000Z"}
+
+
+def test_save_store_empty_pull_keeps_watermark(tmp_path):
+    store_dir = str(tmp_path)
+    watermark = nwss_ingest.save_store(STORED, store_dir, full_refresh_at="2025-03-11T00:00:00")
+
+    assert nwss_ingest.save_store(make_rows(), store_dir) == watermark
+    assert nwss_ingest.read_watermark(store_dir) == watermark
+    assert len(nwss_ingest.load_store(store_dir)[0]) == len(STORED)
+
+
+def test_save_store_empty_first_pull_writes_nothing(tmp_path):
+    assert nwss_ingest.save_store(make_rows(), str(tmp_path)) is None
+    assert nwss_ingest.load_store(str(tmp_path)) == (None, None)
+
+
+def test_fetch_empty_increment_drops_window_rows(tmp_path, monkeypatch):
+    store_dir = str(tmp_path)
+    nwss_ingest.save_store(STORED, store_dir, full_refresh_at=pd.Timestamp.now().isoformat())
+    monkeypatch.setattr(nwss_ingest, "_get", lambda dataset, timeout, where=None: make_rows())
+
+    rows = nwss_ingest.fetch_nwss_raw(store_dir=store_dir, lookback_days=30)
+
+    # The watermark was 2025-03-10, so the window starts on 2025-02-08
+    assert list(rows[ROW_ID]) == ["row-1"]
+    stored, watermark = nwss_ingest.load_store(store_dir)
+    assert list(stored[ROW_ID]) == ["row-1"]
+    assert watermark["sample_collect_date"] == "2025-01-01T00:00:00.000"
+
+
+def test_fetch_republished_dataset_falls_back_to_full_pull(tmp_path, monkeypatch):
+    store_dir = str(tmp_path)
+    nwss_ingest.save_store(STORED, store_dir, full_refresh_at=pd.Timestamp.now().isoformat())
+    # CDC replaced the dataset: every row has a new :id, a new :updated_at and a revised value
+    republished = make_rows(
+        ("new-1", "2025-04-01T00:00:00.000Z", "2025-01-01T00:00:00.000"),
+        ("new-2", "2025-04-01T00:00:00.000Z", "2025-03-01T00:00:00.000"),
+        ("new-3", "2025-04-01T00:00:00.000Z", "2025-03-10T00:00:00.000"),
+        value="7.0",
+    )
+    calls = []
+
+    def get(dataset, timeout, where=None):
+        calls.append(where)
+        return republished
+
+    monkeypatch.setattr(nwss_ingest, "_get", get)
+
+    rows = nwss_ingest.fetch_nwss_raw(store_dir=store_dir, lookback_days=30)
+
+    assert calls[-1] is None
+    assert not rows.duplicated(["sewershed_id", DATE_COL, "sample_matrix", "major_lab_method"]).any()
+    assert sorted(rows[ROW_ID]) == ["new-1", "new-2", "new-3"]
+    assert set(rows["pcr_target_flowpop_lin"]) == {7.0}
+    stored, _ = nwss_ingest.load_store(store_dir)
+    assert sorted(stored[ROW_ID]) == ["new-1", "new-2", "new-3"]
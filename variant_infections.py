@@ -0,0 +1,175 @@
+# Purpose: Split estimated infections into per-lineage infections with the CDC variant shares
+#
+# The infections (Date x state) and the daily variant shares of the nationwide and
+# HHS tables (table x Date x lineage, see variant_tables.py) are aligned once on
+# their dates. Every state is mapped to its HHS table with an index array, so all
+# state x date x lineage infections come out of one broadcast multiply; rounding,
+# trimming and the relevance sort of the lineage columns are array operations too.
+# The shares are loaded and aligned once and applied to every infections scenario
+# in SCENARIOS, each writing its own output folder and zip. Every region CSV is
+# rendered once (in parallel) and the same bytes go to the folder and, deflated,
+# into the zip.
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from variant_tables import load_variant_tables, variant_share_arrays
+
+# Estimated-infections inputs (from nwss_pipeline.SCENARIOS) and their output suffixes
+SCENARIOS = [
+    {
+        "name": "cleaned",
+        "infections_file": "Joe_EstimatedInfections.csv",
+        "output_suffix": "",
+    },
+    {
+        "name": "min",
+        "infections_file": "Joe_EstimatedInfections_min.csv",
+        "output_suffix": "_min",
+    },
+]
+
+# Threads rendering the region CSVs of one scenario
+WRITE_WORKERS = 4
+
+# ------------------------
+# HHS region mapping
+# ------------------------
+HHS_REGIONS = {
+    "CT": 1, "ME": 1, "MA": 1, "NH": 1, "RI": 1, "VT": 1,
+    "NJ": 2, "NY": 2,
+    "DE": 3, "MD": 3, "PA": 3, "VA": 3, "WV": 3,
+    "AL": 4, "FL": 4, "GA": 4, "KY": 4, "MS": 4, "NC": 4, "SC": 4, "TN": 4,
+    "IL": 5, "IN": 5, "MI": 5, "MN": 5, "OH": 5, "WI": 5,
+    "AR": 6, "LA": 6, "NM": 6, "OK": 6, "TX": 6,
+    "IA": 7, "KS": 7, "MO": 7, "NE": 7,
+    "CO": 8, "MT": 8, "ND": 8, "SD": 8, "UT": 8, "WY": 8,
+    "AZ": 9, "CA": 9, "HI": 9, "NV": 9,
+    "AK": 10, "ID": 10, "OR": 10, "WA": 10
+}
+
+# Slot 0 of the share tensor is nationwide, slot r is HHS region r
+TABLE_NAMES = ["nationwide"] + [f"hhs{region}" for region in range(1, 11)]
+
+# Output regions in file order (states by HHS region, then the US), with their infections column
+REGION_ORDER = [state for region in range(1, 11) for state, h in HHS_REGIONS.items() if h == region] + ["US"]
+INFECTIONS_COLUMNS = {"US": "Nationwide"}
+
+
+def variant_columns(tables):
+    """Canonical lineage list: the nationwide table's lineages, excluding 'NA'."""
+    return [c for c in tables["nationwide"].columns if c != 'NA']
+
+
+def proportion_tensor(tables, variants):
+    """(dates, shares) with shares of shape (len(TABLE_NAMES), len(dates), len(variants))."""
+    return variant_share_arrays(tables, TABLE_NAMES, variants)
+
+
+def state_variant_infections(estimated_infections, dates, shares, variants):
+    """Per-lineage infections of every state and the US: {region: frame}, in REGION_ORDER.
+
+    Each frame has Date, Region, Total_State_Infections and one rounded column per lineage,
+    for the dates the region has infections, trimmed after the last date with any lineage
+    infections and with the largest current lineage leftmost (ties: last seen more
+    recently, then name). A date without any HHS share takes the whole nationwide row;
+    missing single lineages count as 0 and the shares are normalised to sum to 1.
+    """
+    regions = REGION_ORDER
+    infections = estimated_infections[[INFECTIONS_COLUMNS.get(r, r) for r in regions]].to_numpy(dtype="float64").T
+    slots = np.array([HHS_REGIONS.get(r, 0) for r in regions])
+    n_regions, n_dates = infections.shape
+
+    # Share-table row of every infections date; dates without shares point at an all-NaN row
+    rows = dates.get_indexer(pd.to_datetime(estimated_infections["Date"]))
+    padded = np.concatenate([shares, np.full((shares.shape[0], 1, shares.shape[2]), np.nan)], axis=1)
+    tables = padded[:, rows]
+
+    # Whole-row nationwide fallback, then missing lineages as 0
+    props = tables[slots]
+    missing_row = np.isnan(props).all(axis=2)
+    props = np.where(missing_row[..., None], tables[0][None], props)
+    props = np.where(np.isnan(props), 0.0, props)
+
+    # Row sums accumulate lineage by lineage (lineage axis outermost), like DataFrame.sum(axis=1)
+    row_sums = np.ascontiguousarray(np.moveaxis(props, 2, 0)).sum(axis=0)
+    has_props = row_sums > 0
+    np.divide(props, row_sums[..., None], out=props, where=has_props[..., None])
+
+    has_infections = ~np.isnan(infections)
+    by_variant = np.where(has_infections[..., None], infections[..., None] * props, 0)
+    counts = np.round(by_variant).astype(int)
+
+    # Keep dates with infections up to the last one with any lineage infections
+    positions = np.arange(n_dates)
+    has_cases = has_infections & (counts != 0).any(axis=2)
+    any_cases = has_cases.any(axis=1)
+    last = n_dates - 1 - np.argmax(has_cases[:, ::-1], axis=1)
+    keep = has_infections & (positions <= last[:, None]) & any_cases[:, None]
+
+    # Relevance sort: current infections, then last date seen, then name (all descending)
+    current = counts[np.arange(n_regions), last]
+    last_seen = np.where(keep[..., None] & (counts != 0), positions[None, :, None], -1).max(axis=1)
+    name_rank = np.broadcast_to(np.argsort(np.argsort(np.array(variants, dtype=object))), current.shape)
+    order = np.lexsort((name_rank, last_seen, current), axis=-1)[:, ::-1]
+    # Regions without any lineage infections come out empty, in the canonical order
+    order[~any_cases] = np.arange(len(variants))
+
+    date_values = estimated_infections["Date"].to_numpy()
+    totals = np.round(infections)
+    state_files = {}
+    for i, region in enumerate(regions):
+        sorted_variants = [variants[j] for j in order[i]]
+        out = pd.DataFrame(counts[i][keep[i]][:, order[i]], columns=sorted_variants)
+        out.insert(0, "Date", date_values[keep[i]])
+        out.insert(1, "Region", region)
+        out.insert(2, "Total_State_Infections", pd.array(totals[i][keep[i]], dtype="Int64"))
+        state_files[region] = out
+    return state_files
+
+
+def load_proportions(time_interval="4_week"):
+    """(variants, dates, shares) of the stored variant tables, aligned once for all scenarios."""
+    tables = load_variant_tables(time_interval)
+    variants = variant_columns(tables)
+    dates, shares = proportion_tensor(tables, variants)
+    return variants, dates, shares
+
+
+def _csv_bytes(df):
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def write_state_files(state_files, output_suffix="", max_workers=WRITE_WORKERS):
+    """Write variant_infections_CDC_<mm-dd-YYYY><suffix>/<region>_variant_infections<suffix>.csv plus a zip.
+
+    The date is the last US date. Each frame is serialised once, in a thread pool; its
+    bytes are written to the folder and streamed as a ZIP_DEFLATED entry, in region order.
+    Returns the output folder.
+    """
+    us_df = state_files["US"]
+    output_date = pd.to_datetime(us_df["Date"].iloc[-1]).strftime("%m-%d-%Y")
+    output_dir = f"variant_infections_CDC_{output_date}{output_suffix}"
+    zip_filename = f"{output_dir}.zip"
+    os.makedirs(output_dir, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool, \
+            zipfile.ZipFile(zip_filename, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
+        for state, data in zip(state_files, pool.map(_csv_bytes, state_files.values())):
+            csv_name = f"{state}_variant_infections{output_suffix}.csv"
+            with open(f"{output_dir}/{csv_name}", "wb") as f:
+                f.write(data)
+            zipf.writestr(csv_name, data)
+    return output_dir
+
+
+def run_scenario(variants, dates, shares, scenario):
+    """Split one scenario's estimated infections by lineage and write its folder and zip."""
+    estimated_infections = pd.read_csv(scenario["infections_file"])
+    state_files = state_variant_infections(estimated_infections, dates, shares, variants)
+    output_dir = write_state_files(state_files, scenario["output_suffix"])
+    print(f"{scenario['name']}: wrote {len(state_files)} region files to {output_dir}")
+    return output_dir
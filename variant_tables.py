@@ -0,0 +1,112 @@
+# Purpose: Storage and loading of the CDC variant-proportion tables (jr58-6ysp)
+#
+# The weekly mean share of every (time_interval, region, week, variant) is kept
+# in one long CSV (variant_shares.csv) across all regions. The daily tables the
+# variant-infection scripts use are rebuilt from it on demand: pivoted, reindexed
+# to daily dates, interpolated and masked after each variant's last observation.
+import os
+
+import numpy as np
+import pandas as pd
+
+VARIANT_STORE = "variant_shares.csv"
+STORE_COLUMNS = ["time_interval", "usa_or_hhsregion", "week_ending", "variant", "share"]
+
+# usa_or_hhsregion value -> table name (also the suffix of the wide <prefix>_<name>.csv files)
+REGIONS = {"USA": "nationwide"}
+REGIONS.update({str(i): f"hhs{i}" for i in range(1, 11)})
+
+
+def weekly_variant_shares(shares):
+    """Mean share per (time_interval, region, week, variant), as a long frame in STORE_COLUMNS order."""
+    weekly = (
+        shares.groupby(["time_interval", "usa_or_hhsregion", "week_ending", "variant"])["share"]
+        .mean()
+        .reset_index()
+    )
+    return weekly[STORE_COLUMNS]
+
+
+def write_variant_store(weekly, path=VARIANT_STORE):
+    """Write the weekly shares, replacing only the time intervals present in `weekly`."""
+    if os.path.exists(path):
+        stored = read_variant_store(path)
+        weekly = pd.concat(
+            [stored[~stored["time_interval"].isin(weekly["time_interval"].unique())], weekly],
+            ignore_index=True
+        )
+    weekly = weekly.sort_values(["time_interval", "usa_or_hhsregion", "week_ending", "variant"])
+    weekly.to_csv(path + ".tmp", index=False, date_format="%Y-%m-%d")
+    os.replace(path + ".tmp", path)
+
+
+def read_variant_store(path=VARIANT_STORE):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; run ww_variants_CDC.py first")
+    # round_trip parsing gives back exactly the floats that were written; only empty shares
+    # are missing (CDC has a lineage literally named "NA")
+    weekly = pd.read_csv(
+        path, dtype={"time_interval": str, "usa_or_hhsregion": str, "variant": str},
+        parse_dates=["week_ending"], float_precision="round_trip",
+        keep_default_na=False, na_values={"share": [""]}
+    )
+    return weekly[STORE_COLUMNS]
+
+
+def mask_after_last_valid(interpolated, observed):
+    """Blank every value of `interpolated` after the last valid value of the same column in `observed`.
+
+    The mask comes from the validity of `observed` accumulated from the end backwards, so
+    all columns are handled in one `where` (no extrapolation past the last observation).
+    """
+    valid = observed.notna().to_numpy()
+    valid_at_or_after = np.logical_or.accumulate(valid[::-1], axis=0)[::-1]
+    return interpolated.where(valid_at_or_after)
+
+
+def daily_variant_shares(weekly):
+    """Daily share tables of one time interval: {usa_or_hhsregion: date-indexed frame}.
+
+    All regions are pivoted to one (region, variant) column each, reindexed to daily dates
+    over the nationwide range and interpolated in one pass. Values after a variant's last
+    observation stay empty. Each region's frame has that region's variants, sorted.
+    """
+    weekly_shares = weekly.set_index(["usa_or_hhsregion", "week_ending", "variant"])["share"]
+    present = weekly_shares.index.droplevel("week_ending").unique()
+    pivoted = weekly_shares.unstack(["usa_or_hhsregion", "variant"])
+
+    # Get the full date range (from the nationwide weeks)
+    nationwide_weeks = weekly_shares.xs("USA", level="usa_or_hhsregion").index.get_level_values("week_ending")
+    full_date_range = pd.date_range(start=nationwide_weeks.min(), end=nationwide_weeks.max(), freq='D')
+
+    daily = pivoted.reindex(full_date_range)
+    interpolated = daily.interpolate(method='linear', limit_direction='forward', axis=0)
+    interpolated = mask_after_last_valid(interpolated, daily)
+
+    tables = {}
+    for region in present.get_level_values("usa_or_hhsregion").unique():
+        variants = sorted(present[present.get_level_values("usa_or_hhsregion") == region].get_level_values("variant"))
+        tables[region] = interpolated[region][variants]
+    return tables
+
+
+def load_variant_tables(time_interval="4_week", path=VARIANT_STORE):
+    """Daily share tables of one time interval from the store, keyed by table name (nationwide, hhs1, ...)."""
+    weekly = read_variant_store(path)
+    tables = daily_variant_shares(weekly[weekly["time_interval"] == time_interval])
+    return {REGIONS[region]: table for region, table in tables.items() if region in REGIONS}
+
+
+def variant_share_arrays(tables, names, variants):
+    """Align daily tables into dense arrays.
+
+    Returns (dates, shares): the union of the tables' dates and a float array of shape
+    (len(names), len(dates), len(variants)) with NaN where a table has no value.
+    """
+    dates = tables[names[0]].index
+    for name in names[1:]:
+        dates = dates.union(tables[name].index)
+    shares = np.full((len(names), len(dates), len(variants)), np.nan)
+    for i, name in enumerate(names):
+        shares[i] = tables[name].reindex(index=dates, columns=variants).to_numpy(dtype="float64")
+    return dates, shares
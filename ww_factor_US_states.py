@@ -1,29 +1,10 @@
 # States
+import numpy as np
 import pandas as pd
-import requests
-from datetime import datetime, timedelta
-from math import log10, floor
-
-# Function to download the CSV file
-def download_csv(base_url, start_date, days_back, file_extension):
-    for i in range(days_back):
-        # Calculate the date for the file
-        date_for_file = start_date - timedelta(days=i)
-        date_str = date_for_file.strftime("%Y-%m-%d") 
-
-        # Construct the file URL
-        file_url = f"{base_url}{date_str}{file_extension}"
-
-        # Attempt to download the file
-        response = requests.get(file_url)
-        if response.status_code == 200:
-            # Save the file if found
-            file_path = f'US_Biobot_county_data_{date_str}.csv'
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
-            return f"CSV file for {date_str} downloaded successfully at {file_path}.", file_path
-
-    return "No CSV file found in the specified date range.", None
+from datetime import datetime
+
+from biobot_download import download_latest_csv
+from ww_utils import conversion_factor_schedule, round_significant
 
 # Base URL and other parameters
 base_url = "https://d1t7q96h7r5kqm.cloudfront.net/" 
@@ -31,8 +12,9 @@ start_date = datetime.now()
 days_back = 14  # Number of days to go back from today
 file_extension = "_automated_csvs/wastewater_by_county.csv"  # File extension
 
-# Call the function to download the CSV
-result, file_path = download_csv(base_url, start_date, days_back, file_extension)
+# Find the newest file of the last days_back days (concurrent HEAD probes) and download it if it changed
+result, file_path = download_latest_csv('US_Biobot_county_data_', file_extension, base_url, start_date, days_back)
+print(result)
 
 
 # Read the CSV into a pandas DataFrame, making sure to parse the first column as dates
@@ -64,13 +46,6 @@ conversion_factors_df = pd.read_csv('ConversionFactors/conversion_factors_by_sta
 # Create a dictionary mapping state abbreviations to conversion factors
 conversion_factor_mapping = pd.Series(conversion_factors_df['Conversion Factor'].values, index=conversion_factors_df.State).to_dict()
 
-def round_to_two_significant_digits(num):
-    if num == 0:
-        return 0
-    else:
-        round_digits = -int(floor(log10(abs(num)))) + 1
-        return round(num, round_digits)
-
 # Dictionary mapping state names to abbreviations
 state_name_to_abbreviation = {
     'Alabama': 'AL',
@@ -127,70 +102,51 @@ state_name_to_abbreviation = {
     'Wyoming': 'WY'
 }
 
-rows_list = []
-states = merged_data['State_Abbrev'].unique()
-
-for state in states:
-    # Filter for current state
-    state_merged_data = merged_data[merged_data['State_Abbrev'] == state]
-
-    # Calculate the weighted average for the current state
-    state_weighted_avg_data = state_merged_data.groupby('Date').apply(lambda x: (x['Concentration'] * x['CENSUS_2020_POP']).sum() / x['CENSUS_2020_POP'].sum()).reset_index(name='weighted_avg_conc')
-    state_weighted_avg_data['Date'] = pd.to_datetime(state_weighted_avg_data['Date'])
-    state_weighted_avg_data = state_weighted_avg_data.sort_values('Date')
-
-    # Prepare the wastewater data for the analysis period
-    ww_state = state_weighted_avg_data.copy()
-    if ww_state['Date'].size > 20:
-        ww_state = ww_state.set_index('Date').resample('D').interpolate().reset_index()
-        ww_state = ww_state[['Date', 'weighted_avg_conc']]
-        ww_state['Date'] = pd.to_datetime(ww_state['Date'])
-    else:
-        # Use national average for comparison if there is not enough data
-        ww_state = ww_state.set_index('Date').resample('D').interpolate().reset_index()
-        ww_state = ww_state[['Date', 'weighted_avg_conc']]
-        ww_state['Date'] = pd.to_datetime(ww_state['Date'])
-
-    # Retrieve the conversion factor for the current state
-    state_cf = conversion_factor_mapping[state]
-
-    def conversion_factor(date):
-        # Define the transition periods
-        start_date_omicron = pd.Timestamp('2021-12-17')
-        end_date_omicron = start_date_omicron + pd.Timedelta(days=30)
-        start_date_post_omicron = pd.Timestamp('2022-08-01')  # Adjusted start date for the second transition
-        end_date_post_omicron = start_date_post_omicron + pd.Timedelta(days=30)
-
-        if date < start_date_omicron:
-            return state_cf  # Before Omicron
-        elif start_date_omicron <= date <= end_date_omicron:
-            # Linear interpolation for the first transition
-            proportion = (date - start_date_omicron) / pd.Timedelta(days=30)
-            return state_cf + proportion * ((state_cf * 1.53) - state_cf)
-        elif end_date_omicron < date < start_date_post_omicron:
-            # After first transition, before second
-            return state_cf * 1.53
-        elif start_date_post_omicron <= date <= end_date_post_omicron:
-            # Linear interpolation for the second transition
-            proportion = (date - start_date_post_omicron) / pd.Timedelta(days=30)
-            return (state_cf * 1.53) + proportion * ((state_cf * 2.28) - (state_cf * 1.53))
-        else:
-            return state_cf * 2.28  # After the second transition
-    
-    # Apply the conversion factor function
-    ww_state['conversion_factor'] = ww_state['Date'].apply(conversion_factor)
-    ww_state['estimated_infections'] = ww_state['weighted_avg_conc'] * ww_state['conversion_factor']
-    
-    # Apply the rounding function to the relevant columns
-    ww_state['weighted_avg_conc'] = ww_state['weighted_avg_conc'].apply(round_to_two_significant_digits)
-
-    for index, row in ww_state.iterrows():
-        rows_list.append({'Country': 'United_States', 'Region': state, 'Date': row['Date'], 'Measure': 'inf', 'Value': row['estimated_infections']})
-        rows_list.append({'Country': 'United_States', 'Region': state, 'Date': row['Date'], 'Measure': 'wastewater', 'Value': row['weighted_avg_conc']})
+def state_weighted_means(merged_data):
+    """Population-weighted mean concentration per state and date, as a wide frame (Date x State_Abbrev).
+
+    Counties without a concentration add to the population but not to the weighted sum.
+    """
+    data = merged_data.dropna(subset=['State_Abbrev', 'Date'])
+    grouped = data.groupby(['State_Abbrev', 'Date'])
+    codes = grouped.ngroup().to_numpy()
+    keys = grouped.size().index
+    weighted = (data['Concentration'] * data['CENSUS_2020_POP']).fillna(0).to_numpy(dtype='float64')
+    weighted_sum = np.bincount(codes, weights=weighted, minlength=len(keys))
+    population = np.bincount(codes, weights=data['CENSUS_2020_POP'].fillna(0).to_numpy(dtype='float64'),
+                             minlength=len(keys))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = weighted_sum / population
+    return pd.Series(means, index=keys).unstack('State_Abbrev'), keys
+
+
+# Weighted averages of all states at once, resampled to daily dates in one frame
+weighted_avg, state_dates = state_weighted_means(merged_data)
+daily_avg = weighted_avg.resample('D').interpolate()
+
+# Each state keeps only its own date range (interpolation also carries values past its last date)
+states = [state for state in merged_data['State_Abbrev'].unique() if pd.notna(state)]
+date_range = state_dates.to_frame(index=False).groupby('State_Abbrev')['Date'].agg(['min', 'max']).loc[states]
+dates = daily_avg.index.values
+in_range = (dates >= date_range['min'].values[:, None]) & (dates <= date_range['max'].values[:, None])
+
+# Conversion factor per state and date, rounded wastewater values
+weighted_avg_conc = daily_avg[states].to_numpy().T
+state_cf = np.array([conversion_factor_mapping[state] for state in states])[:, None]
+estimated_infections = weighted_avg_conc * conversion_factor_schedule(daily_avg.index, state_cf)
+weighted_avg_conc = round_significant(weighted_avg_conc)
+
+# Long table: per state and date an inf row, then a wastewater row
+state_idx, date_idx = np.nonzero(in_range)
+combined_df = pd.DataFrame({
+    'Country': 'United_States',
+    'Region': np.repeat(np.array(states, dtype=object)[state_idx], 2),
+    'Date': np.repeat(dates[date_idx], 2),
+    'Measure': np.tile(np.array(['inf', 'wastewater'], dtype=object), len(state_idx)),
+    'Value': np.column_stack([estimated_infections[state_idx, date_idx], weighted_avg_conc[state_idx, date_idx]]).ravel(),
+})
 
 # Convert the combined DataFrame to JSON for use with ECharts
-combined_df = pd.concat([pd.DataFrame(rows_list)], ignore_index=True)
-
 combined_df.to_csv('US_states_cleaned.csv', index=False)
 
-combined_df.to_json('US_states_cleaned.json', orient='records')
\ No newline at end of file
+combined_df.to_json('US_states_cleaned.json', orient='records')
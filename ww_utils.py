@@ -0,0 +1,74 @@
+# Purpose: Shared helpers for the Biobot-era wastewater -> infections scripts
+# (ww_factor_US.py, ww_factor_US_states.py, Germany_estimate_infections.py,
+# Germany_IHME_calc_conv_factor_optim_max.py, scripts/2024_RKI_Germany.py)
+#
+# The conversion factor follows a piecewise schedule: the base factor until the
+# first breakpoint, then at each breakpoint a linear ramp over RAMP_DAYS to the
+# next multiple of the base factor. It is evaluated over whole date arrays.
+# Published values are rounded to significant digits by one array kernel.
+import numpy as np
+import pandas as pd
+
+# Omicron and post-Omicron transitions (multipliers from https://www.medrxiv.org/content/10.1101/2024.02.03.24302274v1)
+OMICRON_BREAKPOINTS = [pd.Timestamp('2021-12-17'), pd.Timestamp('2022-08-01')]
+OMICRON_MULTIPLIERS = [1.53, 2.28]
+RAMP_DAYS = 30
+
+
+def conversion_factor_schedule(dates, cf=1.0, multipliers=OMICRON_MULTIPLIERS,
+                               breakpoints=OMICRON_BREAKPOINTS, ramp_days=RAMP_DAYS):
+    """Conversion factor for every date, as a float array.
+
+    cf may be a scalar or an array that broadcasts against dates (e.g. one base factor per
+    row, or per state with shape (n_states, 1)). From breakpoints[i] to breakpoints[i] +
+    ramp_days (inclusive) the factor ramps linearly from cf * multipliers[i-1] (cf before
+    the first breakpoint) to cf * multipliers[i]; it then stays at cf * multipliers[i].
+    Values are identical to the former per-date if/elif functions, including NaT, which
+    gets the last level.
+    """
+    dates = pd.DatetimeIndex(np.asarray(dates, dtype="datetime64[ns]"))
+    cf = np.asarray(cf, dtype="float64")
+    ramp = pd.Timedelta(days=ramp_days)
+    levels = [cf] + [cf * m for m in multipliers]
+
+    conditions, choices = [dates < breakpoints[0]], [levels[0]]
+    for i, start in enumerate(breakpoints):
+        end = start + ramp
+        proportion = np.asarray((dates - start) / ramp, dtype="float64")
+        # Linear interpolation during the transition, then the new level until the next breakpoint
+        conditions.append(np.asarray((start <= dates) & (dates <= end)))
+        choices.append(levels[i] + proportion * (levels[i + 1] - levels[i]))
+        if i + 1 < len(breakpoints):
+            conditions.append(np.asarray((end < dates) & (dates < breakpoints[i + 1])))
+            choices.append(levels[i + 1])
+    return np.select(conditions, choices, default=levels[-1])
+
+
+def round_significant(values, digits=2):
+    """Round every value to `digits` significant digits, as a float array.
+
+    Gives exactly what round(num, digits - 1 - floor(log10(abs(num)))) gives per scalar
+    (the former round_to_two_significant_digits): 0 stays 0, negatives round symmetrically,
+    and NaN and infinities pass through. The scaled rint handles nearly every value; the
+    few that lie within rounding error of a tie, or need a power of ten beyond 1e22, are
+    re-rounded with Python's correctly rounded round().
+    """
+    values = np.asarray(values, dtype="float64")
+    rounded = values.copy()
+    nonzero = np.isfinite(values) & (values != 0)
+    x = values[nonzero]
+    decimals = digits - 1 - np.floor(np.log10(np.abs(x))).astype(int)
+
+    # Powers of ten up to 1e22 are exact, so scaling and unscaling round only once
+    with np.errstate(over="ignore", invalid="ignore"):
+        scale = 10.0 ** np.abs(decimals)
+        scaled = np.where(decimals >= 0, x * scale, x / scale)
+        whole = np.rint(scaled)
+        result = np.where(decimals >= 0, whole / scale, whole * scale)
+        distance_to_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+    unsure = (np.abs(decimals) > 22) | (distance_to_tie <= 4 * np.finfo("float64").eps * np.abs(scaled))
+    result[unsure] = [round(float(v), int(d)) for v, d in zip(x[unsure], decimals[unsure])]
+
+    rounded[nonzero] = result
+    rounded[values == 0] = 0.0
+    return rounded
@@ -0,0 +1,125 @@
+# Purpose: Output writers for the JSON files the visualisation pages fetch
+#
+# Records JSON is streamed to disk chunk by chunk (same bytes as
+# DataFrame.to_json(orient='records')) and precompressed .gz/.br siblings are
+# written alongside it in the same pass. An optional columnar layout stores each
+# column once as an array, with the repeated string columns (Country, Region,
+# Measure) as a dictionary plus integer codes. The partitioned layout splits a
+# long Country/Region/Date/Measure/Value table into one small file per Region x
+# Measure plus a manifest, so a page only fetches the series it plots.
+import gzip
+import json
+import os
+import re
+from contextlib import contextmanager
+
+import brotli
+
+CHUNK_ROWS = 50000
+DICTIONARY_COLUMNS = ["Country", "Region", "Measure"]
+
+
+@contextmanager
+def _open_with_siblings(path, compress=True):
+    """Yield a write(text) that writes to `path` and, when compress, to `path`.gz/.br as it goes."""
+    files = [open(path, "wb")]
+    brotli_file = compressor = None
+    if compress:
+        # mtime=0 keeps the .gz bytes stable when the data does not change
+        files.append(gzip.GzipFile(path + ".gz", "wb", compresslevel=9, mtime=0))
+        brotli_file = open(path + ".br", "wb")
+        compressor = brotli.Compressor(quality=11)
+
+    def write(text):
+        data = text.encode("utf-8")
+        for f in files:
+            f.write(data)
+        if compressor is not None:
+            brotli_file.write(compressor.process(data))
+
+    try:
+        yield write
+        if compressor is not None:
+            brotli_file.write(compressor.finish())
+    finally:
+        for f in files + ([brotli_file] if brotli_file is not None else []):
+            f.close()
+
+
+def write_records_json(df, path, chunk_rows=CHUNK_ROWS, compress=True, **to_json_kwargs):
+    """Stream df as a records JSON array to `path` (plus .gz/.br siblings when compress).
+
+    The bytes match df.to_json(path, orient='records', **to_json_kwargs), but only one chunk
+    of rows is rendered in memory at a time.
+    """
+    with _open_with_siblings(path, compress) as write:
+        write("[")
+        first = True
+        for start in range(0, len(df), chunk_rows):
+            # Each chunk renders as "[...]"; drop the brackets and join with commas
+            body = df.iloc[start:start + chunk_rows].to_json(orient="records", **to_json_kwargs)[1:-1]
+            if body:
+                write(body if first else "," + body)
+                first = False
+        write("]")
+
+
+def write_columnar_json(df, path, dictionary_columns=DICTIONARY_COLUMNS, compress=True, **to_json_kwargs):
+    """Write df as column arrays: {"length", "dictionaries": {col: [values]}, "columns": {col: [...]}}.
+
+    Columns in dictionary_columns are stored as integer codes into their dictionary (-1 for
+    missing); the other columns are rendered by pandas (dates as epoch milliseconds unless
+    a date_format is passed), exactly as in the records layout.
+    """
+    dictionaries = {}
+    with _open_with_siblings(path, compress) as write:
+        write('{"length":%d,"columns":{' % len(df))
+        for i, col in enumerate(df.columns):
+            if i:
+                write(",")
+            write(json.dumps(col) + ":")
+            if col in dictionary_columns:
+                codes, uniques = df[col].factorize()
+                dictionaries[col] = uniques.tolist()
+                write(json.dumps(codes.tolist(), separators=(",", ":")))
+            else:
+                write(df[col].to_json(orient="values", **to_json_kwargs))
+        write('},"dictionaries":' + json.dumps(dictionaries, separators=(",", ":")) + "}")
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(value)).strip("_")
+
+
+def write_partitioned_json(df, out_dir, by=("Region", "Measure"), columns=("Date", "Value"), **to_json_kwargs):
+    """Write one compact {"Date": [...], "Value": [...]} file per Region x Measure plus manifest.json.
+
+    The manifest lists every partition with its Region, Measure, file name, row count and
+    first/last date. Partition files from earlier runs that are no longer produced (e.g. a
+    state gated out today) are removed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+    for keys, part in df.groupby(list(by), sort=True):
+        name = "_".join(_slug(key) for key in keys) + ".json"
+        body = ",".join(
+            json.dumps(col) + ":" + part[col].to_json(orient="values", **to_json_kwargs) for col in columns
+        )
+        with open(os.path.join(out_dir, name), "w") as f:
+            f.write("{" + body + "}")
+        entry = dict(zip(by, keys))
+        entry.update({
+            "file": name,
+            "rows": int(len(part)),
+            "first_date": part["Date"].min().strftime("%Y-%m-%d"),
+            "last_date": part["Date"].max().strftime("%Y-%m-%d"),
+        })
+        manifest.append(entry)
+
+    written = {entry["file"] for entry in manifest}
+    for name in os.listdir(out_dir):
+        if name.endswith(".json") and name != "manifest.json" and name not in written:
+            os.remove(os.path.join(out_dir, name))
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest